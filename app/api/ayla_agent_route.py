@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends
 from app.schemas.ayla_agent_schemas import PharmacyResponse, OrderResponse, DianaConversationLink
-from langchain_mongodb import MongoDBChatMessageHistory
 from app.services.ayla.ayla_agent import AylaAgentService
 from app.dependencies.depends import get_ayla_agent, get_db
+from app.core.chat_history_writer import ChatHistoryWriter, get_chat_history_writer
+from app.core.tracing import span
 from app.socket_manger.socket_manager_utils import get_socket_manager
 from pymongo.database import Database
 from configs.logger import logger
@@ -14,7 +15,8 @@ router = APIRouter(tags=["AYLA"], prefix="/api")
 async def handle_pharmacy_response(
     response: PharmacyResponse, 
     ayla_service: AylaAgentService = Depends(get_ayla_agent),
-    db: Database = Depends(get_db)
+    db: Database = Depends(get_db),
+    chat_history: ChatHistoryWriter = Depends(get_chat_history_writer)
 ):
     """Handle incoming responses from pharmacies via Diana service"""
     try:
@@ -22,7 +24,8 @@ async def handle_pharmacy_response(
         logger.info(f"Received pharmacy response: {response}")
         
         # Check if a Diana conversation link already exists for the user_id
-        existing_link = await db.diana_conversation_links.find_one({"user_id": response['user_id']})
+        with span("pharmacy_response.link_lookup"):
+            existing_link = await db.diana_conversation_links.find_one({"user_id": response['user_id']})
         if existing_link:
             logger.info(f"Diana conversation link already exists for user_id: {response['user_id']}")
             return {"status": "success", "message": "Thank You for Your reply. I have bought medicine."}
@@ -34,7 +37,8 @@ async def handle_pharmacy_response(
                 follow_up_diana_conversation_id=response['conversation_id'],
             )
             logger.info(f"Storing Diana conversation link: {conversation_link}")
-            await db.diana_conversation_links.insert_one(conversation_link.model_dump())
+            with span("pharmacy_response.link_insert"):
+                await db.diana_conversation_links.insert_one(conversation_link.model_dump())
         
         # Build the medicines string, filtering out entries with None values
         medicines_str = "\n".join([
@@ -66,38 +70,33 @@ async def handle_pharmacy_response(
         logger.info(f"Saving message to MongoDB: {content}")
         
         # Save to conversation history
-        await ayla_service.save_message(
-            conversation_id=response['user_id'],
-            content=content,
-            sender="ai",
-            type="text",
-            products=[]
-        )
+        with span("pharmacy_response.persist"):
+            await ayla_service.save_message(
+                conversation_id=response['user_id'],
+                content=content,
+                sender="ai",
+                type="text"
+            )
         logger.info(f"Saved message to MongoDB: {content}")
         
         try:
-            # Get MongoDB chat history instance and save message
-            chat_history = MongoDBChatMessageHistory(
-                connection_string = ayla_service.settings.MONGODB_URL,
-                database_name=ayla_service.settings.MONGODB_DB,
-                collection_name="chat_history",
-                session_id=response['user_id']
-            )
-            chat_history.add_ai_message(content)
+            # Queue for the shared chat history writer; does not block on MongoDB
+            chat_history.add_ai_message(response['user_id'], content)
         except Exception as e:
             logger.error(f"Error saving to chat history: {str(e)}")
             # Continue execution even if chat history fails
         socket_manager = get_socket_manager()
         # Send websocket message
-        await socket_manager.send_message(
-            conversation_id=response['user_id'],
-            message={
-                "done": True,
-                "type": "text",
-                "content": content,
-                "sender": "ai"
-            }
-        )
+        with span("pharmacy_response.emit"):
+            await socket_manager.send_message(
+                conversation_id=response['user_id'],
+                message={
+                    "done": True,
+                    "type": "text",
+                    "content": content,
+                    "sender": "ai"
+                }
+            )
         return {"status": "success", "message": "Response forwarded to user"}
         
     except Exception as e:
@@ -107,7 +106,8 @@ async def handle_pharmacy_response(
 @router.post("/order/response")
 async def handle_order_response(
     response: OrderResponse,
-    ayla_service: AylaAgentService = Depends(get_ayla_agent)
+    ayla_service: AylaAgentService = Depends(get_ayla_agent),
+    chat_history: ChatHistoryWriter = Depends(get_chat_history_writer)
 ):
     """Handle incoming responses from pharmacies via Diana service"""
     response = response.model_dump()
@@ -116,31 +116,26 @@ async def handle_order_response(
     content = f"Order {status_text}:\n{response['conversation_summary']}"
     
     # Save to both conversation history tables
-    await ayla_service.save_message(
-        conversation_id=response['user_id'],
-        content=content,
-        sender="ai",
-        type="text"
-    )
+    with span("order_response.persist"):
+        await ayla_service.save_message(
+            conversation_id=response['user_id'],
+            content=content,
+            sender="ai",
+            type="text"
+        )
 
-    chat_history = MongoDBChatMessageHistory(
-        connection_string = ayla_service.settings.MONGODB_URL,
-        database_name=ayla_service.settings.MONGODB_DB,
-        collection_name="chat_history",
-        session_id=response['user_id']
-    )
-    
-    # Get MongoDB chat history instance and save message
-    chat_history.add_ai_message(content)
+    # Queue for the shared chat history writer; does not block on MongoDB
+    chat_history.add_ai_message(response['user_id'], content)
     socket_manager = get_socket_manager()
     # Send websocket message
-    await socket_manager.send_message(
-        conversation_id=response['user_id'],
-        message={
-            "done": True,
-            "type": "text",
-            "content": content,
-            "sender": "ai"
-        }
-    )
+    with span("order_response.emit"):
+        await socket_manager.send_message(
+            conversation_id=response['user_id'],
+            message={
+                "done": True,
+                "type": "text",
+                "content": content,
+                "sender": "ai"
+            }
+        )
     return {"status": "success", "message": "Response forwarded to user"}
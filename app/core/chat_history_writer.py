@@ -0,0 +1,73 @@
+import asyncio
+import json
+from typing import Dict, List, Optional
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, message_to_dict
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from configs.logger import logger
+
+
+class ChatHistoryWriter:
+    """
+    Async, batched writer for the LangChain `chat_history` collection.
+
+    Documents use the same layout as `MongoDBChatMessageHistory` (`SessionId` + JSON `History`),
+    so existing readers are unaffected. Appends are queued without blocking the caller and a
+    single background task flushes them with `insert_many`, which also keeps per-session order.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase, collection_name: str = "chat_history", batch_size: int = 100):
+        self.collection = db[collection_name]
+        self.batch_size = batch_size
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything queued so far, then stop the background task"""
+        if self._task is None:
+            return
+        await self.queue.join()
+        self._task.cancel()
+        self._task = None
+
+    def add_message(self, session_id: str, message: BaseMessage):
+        self.queue.put_nowait({"SessionId": session_id, "History": json.dumps(message_to_dict(message))})
+
+    def add_ai_message(self, session_id: str, content: str):
+        self.add_message(session_id, AIMessage(content=content))
+
+    def add_user_message(self, session_id: str, content: str):
+        self.add_message(session_id, HumanMessage(content=content))
+
+    async def _run(self):
+        while True:
+            batch: List[Dict] = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                await self.collection.insert_many(batch, ordered=True)
+            except Exception as e:
+                logger.error(f"Error saving {len(batch)} chat history messages: {str(e)}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+
+_writer: Optional[ChatHistoryWriter] = None
+
+
+def init_chat_history_writer(db: AsyncIOMotorDatabase) -> ChatHistoryWriter:
+    """Create and start the process-wide writer; called once from the app lifespan"""
+    global _writer
+    _writer = ChatHistoryWriter(db)
+    _writer.start()
+    return _writer
+
+
+def get_chat_history_writer() -> ChatHistoryWriter:
+    if _writer is None:
+        raise RuntimeError("Chat history writer is not initialized")
+    return _writer
@@ -0,0 +1,153 @@
+import asyncio
+import random
+import time
+from typing import Any, Dict, NamedTuple, Optional
+import aiohttp
+from app.core.metrics import metrics
+from configs.logger import logger
+from configs.settings import Settings
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+
+
+class HttpResponse(NamedTuple):
+    status: int
+    data: Any
+
+
+class UpstreamClient:
+    """
+    Keep-alive connection pool for one upstream service.
+
+    Connection failures are retried for every method (the request never reached the server);
+    retryable statuses are retried only for idempotent requests. Backoff is exponential with
+    full jitter.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        limit: int = 100,
+        keepalive_timeout: float = 30.0,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        retries: int = 3,
+        backoff_base: float = 0.2,
+        backoff_max: float = 5.0
+    ):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.limit = limit
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The pooled session, for clients that need raw aiohttp access"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.limit, keepalive_timeout=self.keepalive_timeout),
+                timeout=self.timeout
+            )
+        return self._session
+
+    async def request(self, method: str, path: str, idempotent: Optional[bool] = None, **kwargs) -> HttpResponse:
+        method = method.upper()
+        idempotent = method in IDEMPOTENT_METHODS if idempotent is None else idempotent
+        url = f"{self.base_url}/{path.lstrip('/')}"
+
+        for attempt in range(self.retries + 1):
+            started = time.perf_counter()
+            try:
+                async with self.session.request(method, url, **kwargs) as resp:
+                    if resp.content_type == "application/json":
+                        data = await resp.json()
+                    else:
+                        data = await resp.text()
+                    status = resp.status
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                self._observe(started, "error")
+                if attempt >= self.retries or (not idempotent and not isinstance(e, aiohttp.ClientConnectorError)):
+                    raise
+                logger.warning(f"{self.name} {method} {path} failed ({e.__class__.__name__}), retrying")
+            else:
+                self._observe(started, status)
+                if status not in RETRYABLE_STATUSES or not idempotent or attempt >= self.retries:
+                    return HttpResponse(status, data)
+                logger.warning(f"{self.name} {method} {path} returned {status}, retrying")
+
+            metrics.inc("ayla_http_retries_total", upstream=self.name)
+            await asyncio.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+
+    async def post(self, path: str, **kwargs) -> HttpResponse:
+        return await self.request("POST", path, **kwargs)
+
+    async def get(self, path: str, **kwargs) -> HttpResponse:
+        return await self.request("GET", path, **kwargs)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def _observe(self, started: float, status: Any):
+        metrics.observe("ayla_http_request_seconds", time.perf_counter() - started, upstream=self.name)
+        metrics.inc("ayla_http_requests_total", upstream=self.name, status=status)
+
+
+class HttpClients:
+    """One UpstreamClient per downstream service, sharing the same pooling policy"""
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.clients: Dict[str, UpstreamClient] = {}
+        upstreams = {
+            "ozil": settings.OZIL_SERVICE_URL,
+            "diana": settings.DIANA_SERVICE_URL,
+            "dima": settings.DIMA_SERVICE_URL,
+        }
+        for name, base_url in upstreams.items():
+            if base_url:
+                self.register(name, base_url)
+
+    def register(self, name: str, base_url: str) -> UpstreamClient:
+        client = UpstreamClient(
+            name,
+            base_url,
+            limit=self.settings.HTTP_POOL_LIMIT,
+            keepalive_timeout=self.settings.HTTP_KEEPALIVE_TIMEOUT,
+            connect_timeout=self.settings.HTTP_CONNECT_TIMEOUT,
+            read_timeout=self.settings.HTTP_READ_TIMEOUT,
+            retries=self.settings.HTTP_RETRIES,
+            backoff_base=self.settings.HTTP_BACKOFF_BASE,
+            backoff_max=self.settings.HTTP_BACKOFF_MAX
+        )
+        self.clients[name] = client
+        return client
+
+    def get(self, name: str) -> UpstreamClient:
+        return self.clients[name]
+
+    async def close(self):
+        await asyncio.gather(*(client.close() for client in self.clients.values()))
+
+
+_clients: Optional[HttpClients] = None
+
+
+def init_http_clients(settings: Settings) -> HttpClients:
+    """Create the process-wide upstream pools; called once from the app lifespan"""
+    global _clients
+    _clients = HttpClients(settings)
+    return _clients
+
+
+def get_http_clients() -> HttpClients:
+    if _clients is None:
+        raise RuntimeError("HTTP clients are not initialized")
+    return _clients
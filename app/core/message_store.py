@@ -0,0 +1,102 @@
+from datetime import datetime, UTC
+from typing import Dict, List, Optional
+from bson.objectid import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import DESCENDING, ReturnDocument
+from app.core.metrics import metrics
+from configs.logger import logger
+
+MESSAGES_COLLECTION = "conversation_messages"
+
+
+class MessageLogError(Exception):
+    """The conversation document was updated but the messages could not be added to the full log"""
+
+    def __init__(self, message: str, conversation: Dict):
+        super().__init__(message)
+        self.conversation = conversation
+
+
+class MessageStore:
+    """
+    Conversation messages, stored in two places:
+
+    - `conversation_messages`: the full log, one document per message keyed by
+      (conversation_id, seq). `seq` is the message's position in the conversation, 1..n,
+      the same numbering migrated legacy messages use.
+    - `conversations.recent_messages`: a fixed-size window of the newest messages, which is
+      all a chat turn needs to read. `message_count` tracks the total.
+
+    The conversation update comes first and its `$inc` of `message_count` assigns the seqs, so
+    concurrent appends from any worker get distinct, ordered positions. The log insert follows;
+    if it fails (counted in `ayla_message_log_errors_total`), `MessageLogError` tells the caller
+    the conversation update already landed.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase, window: int = 20):
+        self.db = db
+        self.window = window
+
+    async def append(
+        self,
+        conversation_id: str,
+        messages: List[Dict],
+        set_fields: Optional[Dict] = None,
+        fields: Optional[Dict] = None
+    ) -> Optional[Dict]:
+        """
+        Append messages to a conversation and set any other conversation fields (context,
+        status...) in the same atomic update of the conversation document. Returns the updated
+        conversation's `user_id`, `message_count` and any other `fields` (a projection), or None
+        if it does not exist.
+
+        Raises MessageLogError when only the log insert failed: the messages are in the
+        conversation window and must not be appended again.
+        """
+        now = datetime.now(UTC)
+        conversation_oid = ObjectId(conversation_id)
+        conversation = await self.db.conversations.find_one_and_update(
+            {"_id": conversation_oid},
+            {
+                "$push": {"recent_messages": {"$each": messages, "$slice": -self.window}},
+                "$inc": {"message_count": len(messages)},
+                "$set": {"updated_at": now, **(set_fields or {})}
+            },
+            projection={**(fields or {}), "user_id": 1, "message_count": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if conversation is None:
+            logger.warning(f"Conversation {conversation_id} not found; {len(messages)} message(s) not saved")
+            return None
+
+        first_seq = conversation["message_count"] - len(messages) + 1
+        try:
+            await self.db[MESSAGES_COLLECTION].insert_many([
+                {**message, "conversation_id": conversation_oid, "seq": first_seq + offset, "created_at": now}
+                for offset, message in enumerate(messages)
+            ])
+        except Exception as e:
+            metrics.inc("ayla_message_log_errors_total")
+            raise MessageLogError(
+                f"Messages {first_seq}..{conversation['message_count']} of conversation {conversation_id} "
+                f"were not added to the message log: {str(e)}",
+                conversation
+            ) from e
+        return conversation
+
+    async def get_messages(self, conversation_id: str, limit: int = 50, before_seq: Optional[int] = None) -> List[Dict]:
+        """Page through the full log, newest `limit` messages before `before_seq`, oldest first"""
+        query = {"conversation_id": ObjectId(conversation_id)}
+        if before_seq is not None:
+            query["seq"] = {"$lt": before_seq}
+        cursor = self.db[MESSAGES_COLLECTION].find(query).sort("seq", DESCENDING).limit(limit)
+        messages = await cursor.to_list(length=limit)
+        messages.reverse()
+        return messages
+
+    @staticmethod
+    def recent(conversation: Dict) -> List[Dict]:
+        """The window stored on a conversation document (or the legacy embedded array)"""
+        if "recent_messages" in conversation:
+            return conversation["recent_messages"]
+        return conversation.get("messages", [])
@@ -0,0 +1,99 @@
+from datetime import datetime, UTC
+from typing import Dict, List
+from bson.objectid import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from configs.logger import logger
+
+# Every collection the chat turn and callback routes query, with the indexes that serve them.
+# Index names are left to MongoDB so re-running create_indexes is a no-op.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "conversations": [
+        # get_active_conversation: user_id + status (+ confirmation_context.status), newest first
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "conversation_messages": [
+        # MessageStore: append-only log paged by seq
+        IndexModel([("conversation_id", ASCENDING), ("seq", ASCENDING)], unique=True),
+    ],
+    "diana_conversation_links": [
+        IndexModel([("user_id", ASCENDING)]),
+    ],
+    "chat_history": [
+        # Same key MongoDBChatMessageHistory reads by
+        IndexModel([("SessionId", ASCENDING)]),
+    ],
+    "ozil_outbox": [
+        # OzilOutbox workers: claimable entries, oldest due first
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)]),
+    ],
+}
+
+# (name, collection, filter, sort) for every query on a user-facing path
+HOT_QUERIES = [
+    (
+        "active_conversation",
+        "conversations",
+        {"user_id": "explain-user", "status": "active", "confirmation_context.status": {"$ne": "complete"}},
+        [("created_at", DESCENDING)],
+    ),
+    (
+        "conversation_messages_page",
+        "conversation_messages",
+        {"conversation_id": ObjectId("000000000000000000000000")},
+        [("seq", DESCENDING)],
+    ),
+    (
+        "diana_conversation_link",
+        "diana_conversation_links",
+        {"user_id": "explain-user"},
+        None,
+    ),
+    (
+        "chat_history_session",
+        "chat_history",
+        {"SessionId": "explain-user"},
+        None,
+    ),
+    (
+        "ozil_outbox_claim",
+        "ozil_outbox",
+        {"status": {"$in": ["pending", "processing"]}, "next_attempt_at": {"$lte": datetime(1970, 1, 1, tzinfo=UTC)}},
+        [("next_attempt_at", ASCENDING)],
+    ),
+]
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase):
+    """Create the indexes in INDEXES; safe to call on every startup"""
+    for collection, models in INDEXES.items():
+        names = await db[collection].create_indexes(models)
+        logger.info(f"Ensured indexes on {collection}: {', '.join(names)}")
+
+
+def _plan_stages(plan: Dict) -> List[str]:
+    stages = [plan["stage"]] if "stage" in plan else []
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages.extend(_plan_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+async def explain_hot_queries(db: AsyncIOMotorDatabase) -> List[Dict]:
+    """Run explain() on every hot query and report the winning plan's stages"""
+    results = []
+    for name, collection, query, sort in HOT_QUERIES:
+        cursor = db[collection].find(query).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        stages = _plan_stages(explanation["queryPlanner"]["winningPlan"])
+        results.append({
+            "name": name,
+            "collection": collection,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+        })
+    return results
@@ -0,0 +1,36 @@
+from typing import Dict
+from pymongo import monitoring
+from app.core.metrics import metrics
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """
+    Driver-level latency of every MongoDB command, as ayla_mongo_op_seconds{command, collection}.
+
+    Pass it to the client: AsyncIOMotorClient(url, event_listeners=[MongoCommandMetrics()]).
+    Events fire on the driver's threads; request ids are unique per process.
+    """
+
+    def __init__(self):
+        self._collections: Dict[int, str] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        # For CRUD commands the command's first value is the collection name
+        collection = event.command.get(event.command_name)
+        self._collections[event.request_id] = collection if isinstance(collection, str) else ""
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._observe(event)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._observe(event)
+        metrics.inc("ayla_mongo_op_errors_total", command=event.command_name)
+
+    def _observe(self, event):
+        collection = self._collections.pop(event.request_id, "")
+        metrics.observe(
+            "ayla_mongo_op_seconds",
+            event.duration_micros / 1_000_000,
+            command=event.command_name,
+            collection=collection
+        )
@@ -0,0 +1,88 @@
+from functools import lru_cache
+from typing import Any, Dict, Optional
+from bson import json_util
+from cachetools import TTLCache
+from app.core.metrics import metrics
+from configs.logger import logger
+from configs.settings import get_settings
+
+# The conversation fields a chat turn reads; writers rebuild the cached entry from the
+# document their update returns, projected to these
+SESSION_FIELDS = {
+    "user_id": 1,
+    "status": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "message_count": 1,
+    "recent_messages": 1,
+    "confirmation_context": 1
+}
+
+
+class SessionCache:
+    """
+    Hot cache of each user's active conversation (state plus the recent message window).
+
+    Backed by an in-process LRU for single-worker deployments, or by Redis when a client is
+    given so every worker sees the same entries and invalidations. Writers persist to Mongo
+    first and then refresh (`put`) the entry with the document Mongo returned, or drop it
+    (`invalidate_user`), so the cache never holds state Mongo does not have.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: int = 900, redis_client: Any = None, prefix: str = "ayla:session:"):
+        self.ttl = ttl
+        self.prefix = prefix
+        self.redis = redis_client
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, user_id: str) -> Optional[Dict]:
+        if self.redis is None:
+            conversation = self.memory.get(user_id)
+        else:
+            try:
+                raw = await self.redis.get(self.prefix + user_id)
+            except Exception as e:
+                logger.error(f"Session cache Redis get failed: {str(e)}")
+                raw = None
+            conversation = json_util.loads(raw) if raw is not None else None
+
+        metrics.inc("ayla_session_cache_hits_total" if conversation is not None else "ayla_session_cache_misses_total")
+        return conversation
+
+    async def put(self, conversation: Dict):
+        user_id = conversation["user_id"]
+        if self.redis is None:
+            self.memory[user_id] = conversation
+            return
+        try:
+            await self.redis.set(self.prefix + user_id, json_util.dumps(conversation), ex=self.ttl)
+        except Exception as e:
+            logger.error(f"Session cache Redis set failed: {str(e)}")
+
+    async def invalidate_user(self, user_id: str):
+        if self.redis is None:
+            self.memory.pop(user_id, None)
+            return
+        try:
+            await self.redis.delete(self.prefix + user_id)
+        except Exception as e:
+            logger.error(f"Session cache Redis delete failed: {str(e)}")
+
+
+@lru_cache()
+def get_session_cache() -> Optional[SessionCache]:
+    """Process-wide session cache, or None when SESSION_CACHE_ENABLED is off"""
+    settings = get_settings()
+    if not settings.SESSION_CACHE_ENABLED:
+        return None
+
+    redis_client = None
+    if settings.SESSION_CACHE_USE_REDIS and settings.REDIS_URL:
+        import redis.asyncio as redis
+        redis_client = redis.Redis.from_url(settings.REDIS_URL)
+
+    return SessionCache(
+        maxsize=settings.SESSION_CACHE_MAXSIZE,
+        ttl=settings.SESSION_CACHE_TTL,
+        redis_client=redis_client
+    )
@@ -1,46 +1,135 @@
 import socketio
-from typing import Dict, Any
+import time
+from typing import Dict, Any, Optional
 import logging
+from app.core.metrics import metrics
+from configs.settings import get_settings
 
 logger = logging.getLogger(__name__)
 
-class SocketManager:
+# Delete the user's entry only if it still points at the disconnecting sid (the user may have
+# reconnected elsewhere in the meantime)
+_REMOVE_SID = """
+local user_id = redis.call('GET', KEYS[1])
+if user_id then
+    redis.call('DEL', KEYS[1])
+    if redis.call('GET', ARGV[1] .. user_id) == ARGV[2] then
+        redis.call('DEL', ARGV[1] .. user_id)
+    end
+end
+return user_id
+"""
+
+
+class ConnectionRegistry:
+    """In-process user_id <-> sid map; enough for a single worker and for tests"""
+
     def __init__(self):
+        self.sids: Dict[str, str] = {}
+        self.users: Dict[str, str] = {}
+
+    async def add(self, user_id: str, sid: str):
+        self.sids[user_id] = sid
+        self.users[sid] = user_id
+
+    async def remove(self, sid: str) -> Optional[str]:
+        user_id = self.users.pop(sid, None)
+        if user_id is not None and self.sids.get(user_id) == sid:
+            del self.sids[user_id]
+        return user_id
+
+    async def get(self, user_id: str) -> Optional[str]:
+        return self.sids.get(user_id)
+
+
+class RedisConnectionRegistry(ConnectionRegistry):
+    """user_id <-> sid map shared by every worker and node"""
+
+    def __init__(self, redis_client: Any, prefix: str = "ayla:socket:"):
+        self.redis = redis_client
+        self.user_prefix = prefix + "user:"
+        self.sid_prefix = prefix + "sid:"
+
+    async def add(self, user_id: str, sid: str):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(self.user_prefix + user_id, sid)
+            pipe.set(self.sid_prefix + sid, user_id)
+            await pipe.execute()
+
+    async def remove(self, sid: str) -> Optional[str]:
+        user_id = await self.redis.eval(_REMOVE_SID, 1, self.sid_prefix + sid, self.user_prefix, sid)
+        return user_id.decode() if isinstance(user_id, bytes) else user_id
+
+    async def get(self, user_id: str) -> Optional[str]:
+        sid = await self.redis.get(self.user_prefix + user_id)
+        return sid.decode() if isinstance(sid, bytes) else sid
+
+
+class SocketManager:
+    """
+    Socket.IO server plus the user registry used to address users.
+
+    Every connection joins a room named after its user_id and messages are emitted to that
+    room. With `message_queue` set (a Redis URL) the server uses `AsyncRedisManager`, so an
+    emit from any worker or node is delivered by whichever one holds the socket, and the
+    registry is shared through the same Redis. Without it everything stays in-process.
+    """
+
+    def __init__(self, message_queue: Optional[str] = None):
+        client_manager = None
+        if message_queue:
+            import redis.asyncio as redis
+            client_manager = socketio.AsyncRedisManager(message_queue)
+            self.registry = RedisConnectionRegistry(redis.Redis.from_url(message_queue))
+        else:
+            self.registry = ConnectionRegistry()
+
         self.sio = socketio.AsyncServer(
             async_mode='asgi',
+            client_manager=client_manager,
             cors_allowed_origins='*',
             logger=True,
             engineio_logger=True
         )
-        
+
         self.app = socketio.ASGIApp(
             socketio_server=self.sio,
             socketio_path='socket.io'
         )
-        
-        self.active_connections: Dict[str, str] = {}
-        
+
     async def connect(self, sid: str, user_id: str):
-        """Store new socket.io connection"""
-        self.active_connections[user_id] = sid
+        """Register a new socket.io connection"""
+        await self.sio.enter_room(sid, user_id)
+        await self.registry.add(user_id, sid)
+        metrics.add_gauge("ayla_active_sockets", 1)
         logger.info(f"New connection: {user_id}")
 
-    def disconnect(self, user_id: str):
-        """Remove socket.io connection"""
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
+    async def disconnect(self, sid: str):
+        """Remove a socket.io connection"""
+        user_id = await self.registry.remove(sid)
+        if user_id is not None:
+            metrics.add_gauge("ayla_active_sockets", -1)
             logger.info(f"Connection removed: {user_id}")
 
     async def send_message(self, user_id: str, message: Dict[str, Any]):
-        """Send message to specific client"""
-        if user_id in self.active_connections:
-            try:
-                sid = self.active_connections[user_id]
-                await self.sio.emit('message', message, room=sid)
-                logger.info(f"Message sent to {user_id}")
-            except Exception as e:
-                logger.error(f"Error sending message to {user_id}: {str(e)}")
-        else:
+        """Send message to specific client, whichever worker it is connected to"""
+        try:
+            connected = await self.registry.get(user_id) is not None
+        except Exception as e:
+            # Emitting to the room is harmless if the user is gone, so don't drop the message
+            logger.error(f"Connection registry lookup failed for {user_id}: {str(e)}")
+            connected = True
+
+        if not connected:
             logger.warning(f"Inactive connection: {user_id}")
+            return
+
+        started = time.perf_counter()
+        try:
+            await self.sio.emit('message', message, room=user_id)
+            metrics.observe("ayla_socket_emit_seconds", time.perf_counter() - started)
+            logger.info(f"Message sent to {user_id}")
+        except Exception as e:
+            logger.error(f"Error sending message to {user_id}: {str(e)}")
 
-socket_manager = SocketManager()
\ No newline at end of file
+socket_manager = SocketManager(get_settings().SOCKETIO_MESSAGE_QUEUE)
@@ -0,0 +1,36 @@
+import time
+from contextlib import contextmanager
+from app.core.metrics import metrics
+
+try:
+    from opentelemetry import trace
+    _tracer = trace.get_tracer("ayla")
+except ImportError:
+    _tracer = None
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time one stage of a request:
+
+        with span("turn.llm", provider=provider, model=model):
+            response = await ...
+
+    The duration is always recorded as ayla_stage_seconds{stage=name}, and failures in
+    ayla_stage_errors_total. When opentelemetry-api is installed the stage is also an
+    OpenTelemetry span, nested under the current span and exported by whatever SDK the
+    process configures; without an SDK it is a no-op.
+    """
+    started = time.perf_counter()
+    try:
+        if _tracer is None:
+            yield None
+        else:
+            with _tracer.start_as_current_span(name, attributes=attributes) as current:
+                yield current
+    except Exception:
+        metrics.inc("ayla_stage_errors_total", stage=name)
+        raise
+    finally:
+        metrics.observe("ayla_stage_seconds", time.perf_counter() - started, stage=name)
@@ -0,0 +1,94 @@
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set
+from app.core.metrics import metrics
+from configs.logger import logger
+
+POLICIES = ("reject", "drop_oldest", "merge")
+
+
+class UserWorkQueue:
+    """
+    Runs jobs for the same key (user) one at a time and in arrival order, while different
+    keys run concurrently.
+
+    At most `max_depth` jobs wait behind the running one. When a user is over the limit the
+    policy decides: `reject` refuses the new job, `drop_oldest` discards the oldest waiting
+    job and passes it to `on_drop(key, job)` so the caller can tell the user. `merge` folds the new job into the newest waiting one via `merge(waiting, new)`, so
+    the rest of a burst of messages becomes a single turn; `merge` returns None to refuse the
+    job instead (e.g. when the merged payload would be too large). A key's worker task exits
+    as soon as its queue is empty.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[str, Any], Awaitable[Any]],
+        max_depth: int = 4,
+        policy: str = "merge",
+        merge: Optional[Callable[[Any, Any], Any]] = None,
+        on_drop: Optional[Callable[[str, Any], Awaitable[Any]]] = None
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue policy {policy!r}, expected one of {', '.join(POLICIES)}")
+        if policy == "merge" and merge is None:
+            raise ValueError("The merge policy needs a merge function")
+        self.handler = handler
+        self.max_depth = max_depth
+        self.policy = policy
+        self.merge = merge
+        self.on_drop = on_drop
+        self._pending: Dict[str, Deque[Any]] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._drop_notices: Set[asyncio.Task] = set()
+
+    def submit(self, key: str, payload: Any) -> bool:
+        """Queue a job for `key`; returns False if the policy refused it"""
+        pending = self._pending.setdefault(key, deque())
+
+        if len(pending) >= self.max_depth:
+            merged = self.merge(pending[-1], payload) if self.policy == "merge" and pending else None
+            if merged is not None:
+                pending[-1] = merged
+                metrics.inc("ayla_user_queue_merged_total")
+            elif self.policy == "drop_oldest" and pending:
+                dropped = pending.popleft()
+                pending.append(payload)
+                metrics.inc("ayla_user_queue_dropped_total", policy=self.policy)
+                if self.on_drop is not None:
+                    notice = asyncio.create_task(self._report_drop(key, dropped))
+                    self._drop_notices.add(notice)
+                    notice.add_done_callback(self._drop_notices.discard)
+            else:
+                metrics.inc("ayla_user_queue_dropped_total", policy=self.policy)
+                return False
+        else:
+            pending.append(payload)
+            metrics.add_gauge("ayla_user_queue_pending", 1)
+
+        if key not in self._workers:
+            self._workers[key] = asyncio.create_task(self._drain(key))
+        return True
+
+    def depth(self, key: str) -> int:
+        return len(self._pending.get(key, ()))
+
+    async def _report_drop(self, key: str, payload: Any):
+        try:
+            await self.on_drop(key, payload)
+        except Exception as e:
+            logger.error(f"Reporting a dropped job for {key} failed: {str(e)}")
+
+    async def _drain(self, key: str):
+        pending = self._pending[key]
+        try:
+            while pending:
+                payload = pending.popleft()
+                metrics.add_gauge("ayla_user_queue_pending", -1)
+                try:
+                    await self.handler(key, payload)
+                except Exception as e:
+                    logger.error(f"Queued job for {key} failed: {str(e)}")
+        finally:
+            # No await between the last check and here, so no job can slip in unnoticed
+            self._pending.pop(key, None)
+            self._workers.pop(key, None)
@@ -1,19 +1,68 @@
 from contextlib import asynccontextmanager
+from functools import partial
+from typing import Optional
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 from app.core.socket_manager import socket_manager
 from app.services.ayla_service import AylaService
-from config.settings import Settings
+from app.core.mongo_indexes import ensure_indexes
+from app.core.mongo_monitoring import MongoCommandMetrics
+from app.core.chat_history_writer import init_chat_history_writer
+from app.core.http_clients import init_http_clients
+from app.core.user_work_queue import UserWorkQueue
+from app.services.ayla.ozil_outbox import init_ozil_outbox, stop_ozil_outbox
+from app.api.metrics_route import router as metrics_router
+from configs.settings import Settings
 from dotenv import load_dotenv
 
 load_dotenv()
 
+def merge_chat_messages(pending: dict, new: dict, max_chars: int = 2000) -> Optional[dict]:
+    """Fold a message sent while an earlier one was still waiting into a single turn, up to `max_chars`"""
+    message = f"{pending['message']}\n{new['message']}"
+    if len(message) > max_chars:
+        return None
+    return {**new, 'message': message}
+
+async def send_skipped_notice(user_id: str, data: dict):
+    """Tell the user that a waiting message was dropped unanswered (drop_oldest queue policy)"""
+    preview = data['message'] if len(data['message']) <= 80 else data['message'][:77] + '...'
+    await socket_manager.send_message(
+        user_id,
+        {
+            "type": "error",
+            "content": f'Your message "{preview}" was skipped because too many were waiting. Please send it again if you still need an answer.',
+            "sender": "system"
+        }
+    )
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     settings = Settings()
-    db = AsyncIOMotorClient(settings.MONGODB_URL)[settings.MONGODB_DB]
+    db = AsyncIOMotorClient(settings.MONGODB_URL, event_listeners=[MongoCommandMetrics()])[settings.MONGODB_DB]
+    await ensure_indexes(db)
+    chat_history_writer = init_chat_history_writer(db)
+    http_clients = init_http_clients(settings)
+    # Resumes RFQs left by a previous process once AylaAgentService attaches its sender
+    init_ozil_outbox(db, settings)
     ayla_service = AylaService(db, settings)
+
+    async def process_chat_message(user_id, data):
+        await ayla_service.handle_message(
+            user_id=user_id,
+            message=data['message'],
+            provider=data.get('provider', 'openai')
+        )
+
+    # One turn at a time per user, in order; different users still run concurrently
+    chat_queue = UserWorkQueue(
+        process_chat_message,
+        max_depth=settings.USER_QUEUE_MAX_DEPTH,
+        policy=settings.USER_QUEUE_POLICY,
+        merge=partial(merge_chat_messages, max_chars=settings.USER_QUEUE_MAX_MERGED_CHARS),
+        on_drop=send_skipped_notice
+    )
     
     @socket_manager.sio.on('connect')
     async def handle_connect(sid, environ):
@@ -22,20 +71,34 @@ async def lifespan(app: FastAPI):
         user_id = params.get('user_id')
         if user_id and user_id != 'undefined':
             await socket_manager.connect(sid, user_id)
+
+    @socket_manager.sio.on('disconnect')
+    async def handle_disconnect(sid):
+        await socket_manager.disconnect(sid)
     
     @socket_manager.sio.on('chat_message')
     async def handle_message(sid, data):
-        await ayla_service.handle_message(
-            user_id=data['user_id'],
-            message=data['message'],
-            provider=data.get('provider', 'openai')
-        )
+        if not chat_queue.submit(data['user_id'], data):
+            await socket_manager.send_message(
+                data['user_id'],
+                {
+                    "type": "error",
+                    "content": "Please wait for a reply to your previous messages.",
+                    "sender": "system"
+                }
+            )
     
     app.mount("/", socket_manager.app)
     yield
+    await chat_history_writer.stop()
+    # Undelivered RFQs stay in Mongo for the next process
+    await stop_ozil_outbox()
+    await http_clients.close()
     await socket_manager.sio.disconnect()
 
 app = FastAPI(lifespan=lifespan)
+# Registered before the Socket.IO mount at "/" so it is matched first
+app.include_router(metrics_router)
 
 app.add_middleware(
     CORSMiddleware,
@@ -0,0 +1,203 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from app.core.metrics import metrics
+from configs.logger import logger
+from configs.settings import get_settings
+
+
+class Priority(IntEnum):
+    """Lower value is served first"""
+    INTERACTIVE = 0
+    WELCOME = 1
+    BACKGROUND = 2
+
+
+class AdmissionRejected(Exception):
+    """The LLM call was not admitted: the route is saturated or the wait timed out"""
+
+    def __init__(self, route: str, reason: str):
+        super().__init__(f"LLM route {route} overloaded ({reason})")
+        self.route = route
+        self.reason = reason
+
+
+class TokenBucket:
+    """Requests-per-second limiter; `rate <= 0` disables it"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds until a token is available (0 if one is available now)"""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        if self.rate > 0:
+            self.tokens -= 1
+
+
+class RouteLimiter:
+    """
+    Concurrency and rate limit for one provider/model.
+
+    Callers that cannot start immediately wait in a priority queue of at most `max_waiters`.
+    When it is full, a newcomer evicts the lowest-priority waiter if it outranks it, and is
+    rejected otherwise, so interactive turns keep flowing while background work is shed.
+    """
+
+    def __init__(self, route: str, concurrency: int, rate: float, burst: float, max_waiters: int):
+        self.route = route
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate, burst)
+        self.max_waiters = max_waiters
+        self.in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def acquire(self, priority: Priority, timeout: float):
+        if not self._waiters and self.in_flight < self.concurrency and self.bucket.delay() == 0:
+            self._grant()
+            return
+
+        self._make_room(priority)
+        future = asyncio.get_running_loop().create_future()
+        entry = (int(priority), next(self._seq), future)
+        heapq.heappush(self._waiters, entry)
+        self._depth(priority, 1)
+        self._schedule()
+
+        try:
+            async with asyncio.timeout(timeout):
+                await future
+        except BaseException as e:
+            # Granted a slot in the same loop iteration we were cancelled or timed out in
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.release()
+            if isinstance(e, TimeoutError):
+                raise AdmissionRejected(self.route, "timeout") from None
+            raise
+        finally:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._depth(priority, -1)
+
+    def release(self):
+        self.in_flight -= 1
+        metrics.add_gauge("ayla_llm_admission_in_flight", -1, route=self.route)
+        self._schedule()
+
+    def _grant(self):
+        self.in_flight += 1
+        self.bucket.take()
+        metrics.add_gauge("ayla_llm_admission_in_flight", 1, route=self.route)
+
+    def _make_room(self, priority: Priority):
+        if len(self._waiters) < self.max_waiters:
+            return
+        worst = max(self._waiters)
+        if worst[0] <= priority:
+            raise AdmissionRejected(self.route, "queue_full")
+        self._waiters.remove(worst)
+        heapq.heapify(self._waiters)
+        self._depth(Priority(worst[0]), -1)
+        if not worst[2].done():
+            worst[2].set_exception(AdmissionRejected(self.route, "shed"))
+
+    def _schedule(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._waiters and self.in_flight < self.concurrency:
+            delay = self.bucket.delay()
+            if delay > 0:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._schedule)
+                return
+            priority, _, future = heapq.heappop(self._waiters)
+            self._depth(Priority(priority), -1)
+            if future.done():
+                continue
+            self._grant()
+            future.set_result(None)
+
+    def _depth(self, priority: Priority, amount: int):
+        metrics.add_gauge("ayla_llm_admission_queue_depth", amount, route=self.route, priority=priority.name.lower())
+
+
+class AdmissionController:
+    """
+    Gate in front of every LLM call, with one RouteLimiter per provider/model.
+
+    Limits come from LLM_ADMISSION_LIMITS, looked up by "provider/model", then "provider",
+    then the LLM_ADMISSION_* defaults.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 16,
+        rate: float = 0.0,
+        burst: float = 10.0,
+        max_waiters: int = 100,
+        timeout: float = 10.0,
+        limits: Optional[Dict[str, Dict]] = None
+    ):
+        self.defaults = {"concurrency": concurrency, "rate": rate, "burst": burst, "max_waiters": max_waiters}
+        self.timeout = timeout
+        self.limits = limits or {}
+        self.routes: Dict[str, RouteLimiter] = {}
+
+    def limiter(self, provider: str, model: str) -> RouteLimiter:
+        route = f"{provider}/{model}"
+        if route not in self.routes:
+            config = {**self.defaults, **self.limits.get(provider, {}), **self.limits.get(route, {})}
+            self.routes[route] = RouteLimiter(route, **config)
+        return self.routes[route]
+
+    @asynccontextmanager
+    async def admit(self, provider: str, model: str, priority: Priority = Priority.INTERACTIVE, timeout: Optional[float] = None):
+        limiter = self.limiter(provider, model)
+        labels = {"route": limiter.route, "priority": priority.name.lower()}
+        started = time.perf_counter()
+        try:
+            await limiter.acquire(priority, timeout or self.timeout)
+        except AdmissionRejected as e:
+            metrics.inc("ayla_llm_admission_rejected_total", reason=e.reason, **labels)
+            logger.warning(f"Rejected {labels['priority']} LLM call: {str(e)}")
+            raise
+        metrics.observe("ayla_llm_admission_wait_seconds", time.perf_counter() - started, **labels)
+        try:
+            yield
+        finally:
+            limiter.release()
+
+
+@lru_cache()
+def get_admission_controller() -> AdmissionController:
+    """Process-wide controller shared by every AylaModelManager instance"""
+    settings = get_settings()
+    return AdmissionController(
+        concurrency=settings.LLM_ADMISSION_CONCURRENCY,
+        rate=settings.LLM_ADMISSION_RATE,
+        burst=settings.LLM_ADMISSION_BURST,
+        max_waiters=settings.LLM_ADMISSION_MAX_WAITERS,
+        timeout=settings.LLM_ADMISSION_TIMEOUT,
+        limits=settings.LLM_ADMISSION_LIMITS
+    )
@@ -1,10 +1,13 @@
+import time
+from functools import partial
 from typing import Dict, Any, Optional
-from bson.objectid import ObjectId
 from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime, UTC
 from app.schemas.ayla_agent_schemas import AylaAgentRequest
 from app.core.ayla_document_processor import AylaDocumentProcessor
 from configs.logger import logger
+from app.core.metrics import metrics
+from app.core.tracing import span
 from configs.settings import Settings
 from app.core.dima_http_client import DimaHttpClient
 from app.core.ayla_voice_processor import AudioProcessor
@@ -12,6 +15,14 @@ from app.core.diana_http_client import DianaHttpClient
 from app.socket_manger.socket_manager import SocketManager
 from app.core.ozil_client import OzilClient
 from app.services.ayla.ayla_model_manager import AylaModelManager
+from app.services.ayla.admission import AdmissionRejected, Priority
+from app.services.ayla.circuit_breaker import CircuitOpenError
+from app.services.ayla.fast_path import FastPathExtractor
+from app.services.ayla.model_router import get_model_router
+from app.services.ayla.history_window import window_messages
+from app.core.message_store import MessageLogError, MessageStore
+from app.core.session_cache import SESSION_FIELDS, get_session_cache
+from app.services.ayla.ozil_outbox import get_ozil_outbox
 
 class AylaAgentService:
     def __init__(self, 
@@ -31,24 +42,47 @@ class AylaAgentService:
         self.socket_manager = socket_manager
         self.ozil_client = OzilClient(settings, socket_manager)
         self.model_manager = AylaModelManager()
+        self.fast_path = FastPathExtractor()
+        self.router = get_model_router()
+        self.message_store = MessageStore(db, window=settings.CONVERSATION_WINDOW_MESSAGES)
+        self.session_cache = get_session_cache()
+        # Workers are started and stopped by the app lifespan; this service delivers the RFQs
+        self.ozil_outbox = get_ozil_outbox(db, settings, self.process_response)
 
     async def get_active_conversation(self, user_id: str) -> Optional[Dict]:
-        """Get the most recent incomplete conversation for a user"""
+        """Get the most recent incomplete conversation for a user, from the session cache when hot"""
+        if self.session_cache is not None:
+            conversation = await self.session_cache.get(user_id)
+            if (
+                conversation is not None
+                and conversation.get("status") == "active"
+                and conversation.get("confirmation_context", {}).get("status") != "complete"
+            ):
+                return conversation
+
         conversation = await self.db.conversations.find_one({
             "user_id": user_id,
             "status": "active",
             "confirmation_context.status": {"$ne": "complete"}
         }, sort=[("created_at", -1)])
+        if conversation is not None and self.session_cache is not None:
+            await self.session_cache.put(conversation)
         return conversation
 
     async def create_new_conversation(self, user_id: str) -> str:
         """Create a new conversation and return its ID"""
-        result = await self.db.conversations.insert_one({
+        conversation = await self._insert_conversation(user_id)
+        return str(conversation["_id"])
+
+    async def _insert_conversation(self, user_id: str) -> Dict:
+        """Insert a new conversation and return the document as stored, without reading it back"""
+        conversation = {
             "user_id": user_id,
             "status": "active",
             "created_at": datetime.now(UTC),
             "updated_at": datetime.now(UTC),
-            "messages": [],
+            "recent_messages": [],
+            "message_count": 0,
             "confirmation_context": {
                 "status": "product",
                 "product": None,
@@ -62,25 +96,34 @@ class AylaAgentService:
                 "preferred_delivery_timeline": None,
                 "supplier_list_name": None
             }
-        })
-        return str(result.inserted_id)
+        }
+        result = await self.db.conversations.insert_one(conversation)
+        conversation["_id"] = result.inserted_id
+        if self.session_cache is not None:
+            await self.session_cache.put(conversation)
+        return conversation
 
     async def save_message(self, conversation_id: str, content: str, sender: str, type: str = None) -> None:
         """Save a message to the conversation history"""
-        message_data = {
+        conversation = None
+        try:
+            conversation = await self.message_store.append(conversation_id, [self._build_message(content, sender, type)])
+        except MessageLogError as e:
+            conversation = e.conversation
+            raise
+        finally:
+            if self.session_cache is not None and conversation is not None:
+                # Written outside a chat turn (pharmacy/order callbacks): the owner's next turn re-reads Mongo
+                await self.session_cache.invalidate_user(conversation["user_id"])
+
+    @staticmethod
+    def _build_message(content: str, sender: str, type: str = None) -> Dict:
+        return {
             "content": content,
             "sender": sender,
             "time": datetime.now().strftime("%d/%m/%Y, %H:%M:%S"),
             "type": type
         }
-        
-        await self.db.conversations.update_one(
-            {"_id": ObjectId(conversation_id)},
-            {
-                "$push": {"messages": message_data},
-                "$set": {"updated_at": datetime.now(UTC)}
-            }
-        )
 
     async def send_welcome_message(self, user_id: str, provider: str = "openai", model: str = "gpt-4"):
         """Send welcome message when user connects"""
@@ -92,21 +135,23 @@ class AylaAgentService:
             
             if not conversation:
                 logger.info(f"No active conversation found for user_id: {user_id}. Creating new conversation.")
-                conversation_id = await self.create_new_conversation(user_id)
-                conversation = await self.db.conversations.find_one({"_id": ObjectId(conversation_id)})
+                conversation = await self._insert_conversation(user_id)
             else:
                 logger.info(f"Active conversation found for user_id: {user_id}.")
-                conversation_id = str(conversation["_id"])
 
 
             # Format conversation history for model
-            messages = self._format_conversation_history(conversation)
+            messages = self._format_conversation_history(conversation, model=model)
+            confirmation_context = conversation.get("confirmation_context", {})
 
             response = await self.model_manager.get_model_response(
                 message="",
                 messages=messages,
+                context=self.model_manager.get_context_prompt(confirmation_context),
                 provider=provider,
-                model=model
+                model=model,
+                priority=Priority.WELCOME,
+                confirmation_context=confirmation_context
             )
             
             # # Save the welcome message
@@ -132,78 +177,160 @@ class AylaAgentService:
     async def handle_websocket_request(self, sid: str, request: AylaAgentRequest):
         """Handle chat request via Socket.IO using DSPy"""
         logger.info(f"Processing request for user_id: {request.user_id}")
-        
+        metrics.add_gauge("ayla_turns_in_flight", 1)
+        try:
+            with span("turn", user_id=request.user_id):
+                await self._handle_turn(request)
+        finally:
+            metrics.add_gauge("ayla_turns_in_flight", -1)
+
+    async def _handle_turn(self, request: AylaAgentRequest):
+        """One chat turn; each stage is a child span of the "turn" span"""
         # Get active conversation or create new one
-        conversation = await self.get_active_conversation(request.user_id)
-        
-        if not conversation:
-            conversation_id = await self.create_new_conversation(request.user_id)
-            conversation = await self.db.conversations.find_one({"_id": ObjectId(conversation_id)})
-        else:
-            conversation_id = str(conversation["_id"])
-
-        # Save user message
-        await self.save_message(
-            conversation_id=conversation_id,
-            content=request.message,
-            sender="user",
-            type="text"
-        )
+        with span("turn.conversation_read"):
+            conversation = await self.get_active_conversation(request.user_id)
+            if not conversation:
+                conversation = await self._insert_conversation(request.user_id)
+        conversation_id = str(conversation["_id"])
+
+        # The user message is persisted together with the reply (or the error) at the end of the turn
+        user_message = self._build_message(request.message, "user", "text")
+        persisted = False
+
+        confirmation_context = conversation.get("confirmation_context", {})
+
+        # Routine slot filling goes to a small model, ambiguous or final turns to a strong one.
+        # The route replaces the request's provider/model for the whole turn
+        provider, model, route = request.provider, request.model, None
+        if self.router is not None:
+            route = self.router.select(confirmation_context, request.message)
+            provider, model = route.provider, route.model
 
         # Format conversation history for model
-        messages = self._format_conversation_history(conversation)
+        messages = self._format_conversation_history(conversation, model=model)
+        context = self.model_manager.get_context_prompt(confirmation_context)
         
         try:
-            response = await self.model_manager.get_model_response(
-                message=request.message,
-                messages=messages,
-                provider=request.provider,
-                model=request.model
-            )
-            
-            # Save AI response
-            await self.save_message(
-                conversation_id=conversation_id,
-                content=response.ayla_response,
-                sender="ai",
-                type="text"
-            )
-            
-            if response.to_ozil and response.status == "complete":
-                await self._handle_complete_conversation(conversation_id, response, request)
+            # Bare answers to the question just asked ("25", "private only") skip the LLM entirely
+            response = None
+            if self.settings.FAST_PATH_ENABLED and (request.language or "en") == "en":
+                with span("turn.fast_path"):
+                    response = self.fast_path.reply(request.message, confirmation_context, messages)
+            if response is not None:
+                # Not a model call, so not counted against the route
+                route = None
+            started = time.perf_counter()
+
+            if response is not None:
+                logger.info(f"Fast path reply for conversation {conversation_id}")
+            elif self.settings.LLM_STREAMING:
+                with span("turn.llm", provider=provider, model=model, streaming=True):
+                    response = await self.model_manager.stream_model_response(
+                        message=request.message,
+                        messages=messages,
+                        on_token=partial(self._send_chunk, request.user_id),
+                        context=context,
+                        provider=provider,
+                        model=model,
+                        confirmation_context=confirmation_context
+                    )
             else:
-                await self._handle_ongoing_conversation(conversation_id, response, request)
+                with span("turn.llm", provider=provider, model=model, streaming=False):
+                    response = await self.model_manager.get_model_response(
+                        message=request.message,
+                        messages=messages,
+                        context=context,
+                        provider=provider,
+                        model=model,
+                        confirmation_context=confirmation_context
+                    )
+            if route is not None:
+                self.router.observe(route, time.perf_counter() - started)
+
+            complete = response.to_ozil and response.status == "complete"
+
+            # Persisted in three steps, one after another. A completed RFQ goes to the Ozil outbox
+            # first instead of being sent inline: the enqueue is keyed by conversation, so if a
+            # later step fails, the turn that completes it again is a no-op for Ozil, and a
+            # completed conversation always has its RFQ queued. Then both messages and the new
+            # context/status go into one atomic conversation update, and finally into the full log
+            turn_messages = [user_message, self._build_message(response.ayla_response, "ai", "text")]
+            update = self._conversation_update(response, complete)
+            with span("turn.persist", complete=complete):
+                if complete:
+                    await self.ozil_outbox.enqueue(
+                        conversation_id, self._prepare_ozil_message(response, request, provider, model)
+                    )
+                try:
+                    stored = await self.message_store.append(
+                        conversation_id, turn_messages, set_fields=update, fields=self._session_fields()
+                    )
+                except MessageLogError as e:
+                    # The conversation update landed, so the turn stands and the reply is sent;
+                    # only the full log is missing these messages
+                    logger.error(str(e))
+                    stored = e.conversation
+            persisted = True
+            await self._refresh_session(conversation["user_id"], stored)
             
+            with span("turn.emit"):
+                if complete:
+                    await self._handle_complete_conversation(conversation_id, response, request)
+                else:
+                    await self._handle_ongoing_conversation(conversation_id, response, request)
+            
+        except (AdmissionRejected, CircuitOpenError) as e:
+            await self._handle_error(
+                conversation,
+                str(e),
+                [] if persisted else [user_message],
+                reply="We're handling a lot of requests right now. Please try again in a moment."
+            )
         except Exception as e:
-            await self._handle_error(conversation_id, request.user_id, str(e))
+            await self._handle_error(conversation, str(e), [] if persisted else [user_message])
 
-    async def _handle_complete_conversation(self, conversation_id: str, response: Any, request: AylaAgentRequest):
-        """Handle completed conversation flow"""
-        # Update conversation status
-        await self.db.conversations.update_one(
-            {"_id": ObjectId(conversation_id)},
-            {
-                "$set": {
-                    "status": "completed",
-                    "completed_at": datetime.now(UTC),
-                    "confirmation_context": {
-                        "status": "complete",
-                        "product": response.product_name,
-                        "product_category": response.product_category,
-                        "quantity": response.quantity,
-                        "supplier_type": response.supplier_type,
-                        "brand": response.brand,
-                        "model": response.model,
-                        "description": response.description,
-                        "delivery_location": response.delivery_location,
-                        "preferred_delivery_timeline": response.preferred_delivery_timeline,
-                        "supplier_list_name": response.supplier_list_name
-                    }
-                }
+    def _session_fields(self) -> Optional[Dict]:
+        """Fields to read back from a turn's conversation update, to refresh the session cache"""
+        return SESSION_FIELDS if self.session_cache is not None else None
+
+    async def _refresh_session(self, user_id: str, stored: Optional[Dict]):
+        """
+        Write-through: cache the conversation as the turn's update returned it. Built from that
+        document rather than the copy read at the start of the turn, it includes anything a
+        callback saved in the meantime.
+        """
+        if self.session_cache is None:
+            return
+        if stored is not None and stored.get("status") == "active":
+            await self.session_cache.put(stored)
+        else:
+            await self.session_cache.invalidate_user(user_id)
+
+    def _conversation_update(self, response: Any, complete: bool) -> Dict:
+        """Conversation fields to set after a model turn"""
+        update = {
+            "confirmation_context": {
+                "status": "complete" if complete else response.status,
+                "product": response.product_name,
+                "product_category": response.product_category,
+                "quantity": response.quantity,
+                "supplier_type": response.supplier_type,
+                "brand": response.brand,
+                "model": response.model,
+                "description": response.description,
+                "delivery_location": response.delivery_location,
+                "preferred_delivery_timeline": response.preferred_delivery_timeline,
+                "supplier_list_name": response.supplier_list_name
             }
-        )
+        }
+        if complete:
+            update["status"] = "completed"
+            update["completed_at"] = datetime.now(UTC)
+        return update
 
-        logger.info("Calling Ozil Process Response Method")
+    async def _handle_complete_conversation(self, conversation_id: str, response: Any, request: AylaAgentRequest):
+        """Handle completed conversation flow; the RFQ is already queued in the Ozil outbox"""
+        logger.info(f"RFQ for conversation {conversation_id} queued for Ozil")
 
         # Send initial message to frontend
         await self.socket_manager.send_message(
@@ -216,33 +343,8 @@ class AylaAgentService:
             }
         )
 
-        # Prepare and send to Ozil
-        ozil_message = self._prepare_ozil_message(response, request)
-        await self.process_response(ozil_message)
-
     async def _handle_ongoing_conversation(self, conversation_id: str, response: Any, request: AylaAgentRequest):
-        """Handle ongoing conversation flow"""
-        await self.db.conversations.update_one(
-            {"_id": ObjectId(conversation_id)},
-            {
-                "$set": {
-                    "confirmation_context": {
-                        "status": response.status,
-                        "product": response.product_name,
-                        "product_category": response.product_category,
-                        "quantity": response.quantity,
-                        "supplier_type": response.supplier_type,
-                        "brand": response.brand,
-                        "model": response.model,
-                        "description": response.description,
-                        "delivery_location": response.delivery_location,
-                        "preferred_delivery_timeline": response.preferred_delivery_timeline,
-                        "supplier_list_name": response.supplier_list_name
-                    }
-                }
-            }
-        )
-        
+        """Handle ongoing conversation flow; the new context is already persisted"""
         await self.socket_manager.send_message(
             request.user_id,
             {
@@ -253,47 +355,80 @@ class AylaAgentService:
             }
         )
 
-    async def _handle_error(self, conversation_id: str, user_id: str, error_message: str):
-        """Handle error cases"""
-        logger.error(f"Error in handle_websocket_request: {error_message}")
-        await self.save_message(
-            conversation_id=conversation_id,
-            content=f"An error occurred while processing your request: {error_message}",
-            sender="ai",
-            type="text"
-        )
+    async def _send_chunk(self, user_id: str, content: str):
+        """Push a partial ayla_response to the client while the model is still generating"""
         await self.socket_manager.send_message(
             user_id,
-            {"done": True, "type": "text", "content": "An error occurred while processing your request.", "sender": "ai"}
+            {
+                "done": False,
+                "type": "text_delta",
+                "content": content,
+                "sender": "ai"
+            }
         )
 
-    def _format_conversation_history(self, conversation: Dict) -> list:
-        """Format conversation history for the model"""
-        messages = [
+    async def _handle_error(
+        self,
+        conversation: Dict,
+        error_message: str,
+        pending_messages: list = None,
+        reply: str = "An error occurred while processing your request."
+    ):
+        """Handle error cases; `pending_messages` are turn messages not yet persisted"""
+        logger.error(f"Error in handle_websocket_request: {error_message}")
+        error = self._build_message(f"An error occurred while processing your request: {error_message}", "ai", "text")
+        messages = [*(pending_messages or []), error]
+        with span("turn.persist_error"):
+            try:
+                stored = await self.message_store.append(str(conversation["_id"]), messages, fields=self._session_fields())
+            except MessageLogError as e:
+                logger.error(str(e))
+                stored = e.conversation
+        await self._refresh_session(conversation["user_id"], stored)
+        with span("turn.emit"):
+            await self.socket_manager.send_message(
+                conversation["user_id"],
+                {"done": True, "type": "text", "content": reply, "sender": "ai"}
+            )
+
+    def _format_conversation_history(self, conversation: Dict, model: str = "gpt-4o-mini") -> list:
+        """
+        Format conversation history for the model.
+
+        `confirmation_context` is the canonical memory of the request and is sent separately
+        (see `AylaModelManager.get_context_prompt`), so only the newest messages that fit
+        LLM_HISTORY_TOKEN_BUDGET are included here.
+        """
+        history = [
             {
-                "role": "system",
-                "content": self.model_manager.get_system_prompt(conversation.get("confirmation_context", {}))
+                "role": "assistant" if msg["sender"] == "ai" else "user",
+                "content": msg["content"]
             }
+            for msg in MessageStore.recent(conversation)
         ]
-        
-        if "messages" in conversation:
-            for msg in conversation["messages"]:
-                role = "assistant" if msg["sender"] == "ai" else "user"
-                messages.append({
-                    "role": role,
-                    "content": msg["content"]
-                })
-        
+        messages, dropped_tokens = window_messages(
+            history,
+            token_budget=self.settings.LLM_HISTORY_TOKEN_BUDGET,
+            max_messages=self.settings.LLM_HISTORY_MAX_MESSAGES,
+            model=model
+        )
+        if dropped_tokens:
+            metrics.inc("ayla_history_tokens_dropped_total", dropped_tokens)
+            logger.info(
+                f"History window for conversation {conversation.get('_id')}: kept {len(messages)}/{len(history)} "
+                f"messages, dropped {dropped_tokens} tokens"
+            )
+
         return messages
 
-    def _prepare_ozil_message(self, response: Any, request: AylaAgentRequest) -> Dict:
-        """Prepare message for Ozil service"""
+    def _prepare_ozil_message(self, response: Any, request: AylaAgentRequest, provider: str, model: str) -> Dict:
+        """Prepare message for Ozil service, with the provider/model the turn was routed to"""
         response_dict = response.toDict()
         response_dict.update({
             "user_id": request.user_id,
             "language": request.language if request.language else "en",
-            "provider": request.provider if request.provider else "openai",
-            "model": request.model if request.model else "gpt-4"
+            "provider": provider if provider else "openai",
+            "model": model if model else "gpt-4"
         })
         return response_dict
 
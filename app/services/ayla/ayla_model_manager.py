@@ -1,12 +1,25 @@
+import asyncio
+import hashlib
+import time
 import dspy
-from typing import Dict, Any, Optional
+import litellm
+from typing import Awaitable, Callable, Dict, Any, Optional
+from app.core.metrics import metrics
+from app.services.ayla.admission import Priority, get_admission_controller
+from app.services.ayla.context_delta import apply_delta
 from app.services.ayla.dspy_config import DSPyManager
+from app.services.ayla.llm_executor import get_llm_executor
+from app.services.ayla.response_cache import ResponseCache, get_response_cache
+from app.services.ayla.stream_parser import FieldStreamParser
+from app.services.ayla.structured_output import StructuredOutputError, response_format, structured_predict, with_reasoning
 from configs.logger import logger
+from configs.settings import get_settings
 
 class ChatResponse(dspy.Signature):
     """Process user requests for product quotes step by step."""
-    message: str = dspy.InputField(desc="User's input message")
     messages: list = dspy.InputField(desc="Conversation history")
+    context: str = dspy.InputField(desc="Current status and the details processed so far")
+    message: str = dspy.InputField(desc="User's input message")
     ayla_response: str = dspy.OutputField(desc="Ayla's response to the user")
     to_ozil: bool = dspy.OutputField(desc="When user finish giving details which he wants to provide, set to_ozil=True")
     status: str = dspy.OutputField(desc="Current status: 'product', 'quantity', 'supplier_type', or 'complete'")
@@ -22,13 +35,24 @@ class ChatResponse(dspy.Signature):
     supplier_list_name: Optional[str] = dspy.OutputField(desc="Processed supplier list name")
 
 
-class AylaModelManager:
-    def __init__(self):
-        self.chat_processor = dspy.ChainOfThought(ChatResponse)
-        self.dspy_manager = DSPyManager()
+class ChatDelta(dspy.Signature):
+    """Process user requests for product quotes step by step, reporting only what changed."""
+    messages: list = dspy.InputField(desc="Conversation history")
+    context: str = dspy.InputField(desc="Current status and the details processed so far")
+    message: str = dspy.InputField(desc="User's input message")
+    ayla_response: str = dspy.OutputField(desc="Ayla's response to the user")
+    to_ozil: bool = dspy.OutputField(desc="When user finish giving details which he wants to provide, set to_ozil=True")
+    status: str = dspy.OutputField(desc="Current status: 'product', 'quantity', 'supplier_type', or 'complete'")
+    changes: Dict[str, Any] = dspy.OutputField(
+        desc="Only the details the user gave or corrected in this message, keyed by product_name, product_category, "
+             "quantity (integer), supplier_type (private/public/both), brand, model, description, delivery_location, "
+             "preferred_delivery_timeline or supplier_list_name. Leave out every detail that did not change; {} if none did"
+    )
+
 
-    def get_system_prompt(self, confirmation_context: Dict) -> str:
-        return """You are Ayla, a professional procurement assistant. Your task is to process product quote requests step by step. Warmly welcome the user and ask for the product details.
+# Static rules and few-shot examples. Built once at import so every request shares a
+# byte-identical prompt prefix that providers can cache; per-turn state goes in `context`.
+AYLA_INSTRUCTIONS = """You are Ayla, a professional procurement assistant. Your task is to process product quote requests step by step. Warmly welcome the user and ask for the product details.
 
 ## IMPORTANT RULES:
 1. Do not ask questions about those details which are already provided by user implicitly.
@@ -165,10 +189,37 @@ Product Name: Cat6 Ethernet cables, 5 meters each
 Quantity: 100
 Supplier Type: private
 Status: Complete
-to_ozil: True
+to_ozil: True"""
 
+CHAT_SIGNATURE = ChatResponse.with_instructions(AYLA_INSTRUCTIONS)
+DELTA_SIGNATURE = ChatDelta.with_instructions(AYLA_INSTRUCTIONS)
+# Changes whenever the prompt does, so cached responses never outlive the prompt that produced them
+PROMPT_VERSION = hashlib.sha256(AYLA_INSTRUCTIONS.encode("utf-8")).hexdigest()[:12]
+CHAT_TEMPERATURE = 0.2
 
-Current Status: {status}
+
+class AylaModelManager:
+    def __init__(self):
+        self.dspy_manager = DSPyManager()
+        self.executor = get_llm_executor()
+        self.admission = get_admission_controller()
+        self.settings = get_settings()
+        # In delta mode the model returns only changed fields, merged into the stored context
+        self.delta = self.settings.LLM_DELTA_MODE
+        self.signature = DELTA_SIGNATURE if self.delta else CHAT_SIGNATURE
+        # Reasoning costs output tokens on every turn, so it is opt-in
+        self.predictor = self.dspy_manager.get_predictor(
+            self.signature,
+            dspy.ChainOfThought if self.settings.LLM_REASONING else dspy.Predict
+        )
+        self.structured = self.settings.LLM_OUTPUT_MODE == "json"
+        self.structured_signature = with_reasoning(self.signature) if self.settings.LLM_REASONING else self.signature
+        self.structured_format = response_format(self.structured_signature)
+        self.response_cache = get_response_cache()
+
+    def get_context_prompt(self, confirmation_context: Dict) -> str:
+        """Per-turn state; kept out of AYLA_INSTRUCTIONS so the prompt prefix stays cacheable"""
+        return """Current Status: {status}
 Processed Details:
 - Product Name: {product}
 - Product Category: {product_category}
@@ -181,34 +232,250 @@ Processed Details:
 - Preferred Delivery Timeline: {preferred_delivery_timeline}
 - Supplier List Name: {supplier_list_name}
 """.format(
-                    status=confirmation_context.get("status", "product"),
-                    product=confirmation_context.get("product", "Not processed"),
-                    product_category=confirmation_context.get("product_category", "Not processed"),
-                    quantity=confirmation_context.get("quantity", "Not processed"),
-                    supplier_type=confirmation_context.get("supplier_type", "Not processed"),
-                    brand=confirmation_context.get("brand", "Not processed"),
-                    model=confirmation_context.get("model", "Not processed"),
-                    description=confirmation_context.get("description", "Not processed"),
-                    delivery_location=confirmation_context.get("delivery_location", "Not processed"),
-                    preferred_delivery_timeline=confirmation_context.get("preferred_delivery_timeline", "Not processed"),
-                    supplier_list_name=confirmation_context.get("supplier_list_name", "Not processed")
-                )
-
-
-    async def get_model_response(self, message: str, messages: list, provider: str = "openai", model: str = "gpt-4") -> ChatResponse:
+            status=confirmation_context.get("status", "product"),
+            product=confirmation_context.get("product", "Not processed"),
+            product_category=confirmation_context.get("product_category", "Not processed"),
+            quantity=confirmation_context.get("quantity", "Not processed"),
+            supplier_type=confirmation_context.get("supplier_type", "Not processed"),
+            brand=confirmation_context.get("brand", "Not processed"),
+            model=confirmation_context.get("model", "Not processed"),
+            description=confirmation_context.get("description", "Not processed"),
+            delivery_location=confirmation_context.get("delivery_location", "Not processed"),
+            preferred_delivery_timeline=confirmation_context.get("preferred_delivery_timeline", "Not processed"),
+            supplier_list_name=confirmation_context.get("supplier_list_name", "Not processed")
+        )
+
+    async def get_model_response(
+        self,
+        message: str,
+        messages: list,
+        context: str = "",
+        provider: str = "openai",
+        model: str = "gpt-4",
+        priority: Priority = Priority.INTERACTIVE,
+        confirmation_context: Optional[Dict] = None
+    ) -> ChatResponse:
+        """
+        Run the chat turn. Always returns ChatResponse fields; in delta mode the model's changes
+        are merged into `confirmation_context` (the stored state that `context` was rendered from).
+        """
+        cache_key = self._cache_key(message, messages, context, provider, model)
+        cached = await self._get_cached(cache_key)
+        if cached is not None:
+            return self._full_response(cached, confirmation_context)
+
         try:
-            self.dspy_manager.configure_default_lm(
-                provider=provider,
-                model=model,
-                temperature=0.2
+            hedge = self._hedge_route(provider, model)
+            if hedge is None:
+                response = await self._admitted_predict(message, messages, context, provider, model, priority)
+            else:
+                response = await self._hedged_predict(message, messages, context, provider, model, priority, hedge)
+        except Exception as e:
+            logger.error(f"Error in get_model_response: {str(e)}")
+            raise
+
+        await self._set_cached(cache_key, response)
+        return self._full_response(response, confirmation_context)
+
+    def _full_response(self, response: Any, confirmation_context: Optional[Dict]) -> ChatResponse:
+        return apply_delta(confirmation_context, response) if self.delta else response
+
+    async def _admitted_predict(
+        self,
+        message: str,
+        messages: list,
+        context: str,
+        provider: str,
+        model: str,
+        priority: Priority
+    ) -> ChatResponse:
+        provider, model = self.dspy_manager.select_route(provider, model)
+        async with self.admission.admit(provider, model, priority):
+            return await self.executor.run(
+                self._predict,
+                message,
+                messages,
+                context,
+                provider,
+                model,
+                label=f"{provider}/{model}"
             )
 
-            predict = dspy.Predict(ChatResponse)
-            response = predict(
-                message=message,
-                messages=messages
+    def _hedge_route(self, provider: str, model: str) -> Optional[tuple]:
+        """Secondary (provider, model) to hedge this route with, if hedging is configured for it"""
+        if not self.settings.LLM_HEDGING_ENABLED:
+            return None
+        secondary = self.settings.LLM_HEDGE_ROUTES.get(f"{provider}/{model}")
+        return tuple(secondary.split("/", 1)) if secondary else None
+
+    def _hedge_delay(self, label: str) -> float:
+        """How long the primary gets before the hedge fires: its observed LLM_HEDGE_PERCENTILE latency"""
+        histogram = metrics.get_histogram("ayla_llm_execution_seconds", route=label)
+        if histogram is None or histogram.count < self.settings.LLM_HEDGE_MIN_SAMPLES:
+            return self.settings.LLM_HEDGE_MIN_DELAY
+        return max(self.settings.LLM_HEDGE_MIN_DELAY, histogram.percentile(self.settings.LLM_HEDGE_PERCENTILE))
+
+    async def _hedged_predict(
+        self,
+        message: str,
+        messages: list,
+        context: str,
+        provider: str,
+        model: str,
+        priority: Priority,
+        hedge: tuple
+    ) -> ChatResponse:
+        """
+        Run the primary route; if it is still running after the hedge delay, also run the hedge
+        route and return whichever valid response arrives first. The loser is cancelled (a DSPy
+        call already on an executor thread finishes there, but its result is dropped).
+        """
+        label = f"{provider}/{model}"
+        primary = asyncio.create_task(self._admitted_predict(message, messages, context, provider, model, priority))
+        done, _ = await asyncio.wait({primary}, timeout=self._hedge_delay(label))
+        if done:
+            return primary.result()
+
+        metrics.inc("ayla_llm_hedges_total", route=label)
+        # Hedges are extra load, so they are the first thing admission control sheds
+        secondary = asyncio.create_task(self._admitted_predict(message, messages, context, *hedge, Priority.BACKGROUND))
+        names = {primary: "primary", secondary: "secondary"}
+        pending = {primary, secondary}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        logger.warning(f"Hedged {names[task]} call for {label} failed: {str(error)}")
+                    elif task.result() is not None and task.result().ayla_response:
+                        metrics.inc("ayla_llm_hedge_wins_total", route=label, winner=names[task])
+                        return task.result()
+            raise error or ValueError(f"No valid response from {label} or its hedge")
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _cache_key(self, message: str, messages: list, context: str, provider: str, model: str) -> Optional[str]:
+        if self.response_cache is None:
+            return None
+        namespace = f"{PROMPT_VERSION}:{self.settings.LLM_OUTPUT_MODE}:{int(self.settings.LLM_REASONING)}:{int(self.delta)}"
+        return ResponseCache.make_key(namespace, provider, model, CHAT_TEMPERATURE, context, messages, message)
+
+    async def _get_cached(self, cache_key: Optional[str]) -> Optional[ChatResponse]:
+        if cache_key is None:
+            return None
+        cached = await self.response_cache.get(cache_key)
+        return dspy.Prediction(**cached) if cached is not None else None
+
+    async def _set_cached(self, cache_key: Optional[str], response: ChatResponse):
+        if cache_key is not None:
+            await self.response_cache.set(cache_key, response.toDict())
+
+    def _predict(self, message: str, messages: list, context: str, provider: str, model: str) -> ChatResponse:
+        """Blocking DSPy call; runs on an LLM executor thread, never on the event loop"""
+        inputs = {"messages": messages, "context": context, "message": message}
+        with (
+            self.dspy_manager.track(provider, model),
+            self.dspy_manager.lm_context(provider=provider, model=model, temperature=CHAT_TEMPERATURE)
+        ):
+            if self.structured:
+                lm = self.dspy_manager.get_pooled_lm(provider=provider, model=model, temperature=CHAT_TEMPERATURE)
+                try:
+                    return structured_predict(lm, self.structured_signature, inputs, self.structured_format)
+                except StructuredOutputError as e:
+                    metrics.inc("ayla_llm_parse_failures_total", mode="json", route=f"{provider}/{model}")
+                    logger.error(f"Structured output did not parse, retrying with the text adapter: {str(e)}")
+            return self.predictor(**inputs)
+
+    async def stream_model_response(
+        self,
+        message: str,
+        messages: list,
+        on_token: Callable[[str], Awaitable[None]],
+        context: str = "",
+        provider: str = "openai",
+        model: str = "gpt-4",
+        priority: Priority = Priority.INTERACTIVE,
+        confirmation_context: Optional[Dict] = None
+    ) -> ChatResponse:
+        """
+        Stream the completion through LiteLLM's native async API, forwarding `ayla_response`
+        text to `on_token` as it arrives. The structured fields are parsed once the stream
+        ends; if that fails we fall back to the regular (non-streaming) DSPy call.
+        """
+        if self.structured:
+            # JSON output has no field markers to stream on; send the reply in one piece
+            response = await self.get_model_response(
+                message, messages, context, provider, model, priority, confirmation_context
             )
+            await on_token(response.ayla_response)
             return response
+
+        cache_key = self._cache_key(message, messages, context, provider, model)
+        cached = await self._get_cached(cache_key)
+        if cached is not None:
+            await on_token(cached.ayla_response)
+            return self._full_response(cached, confirmation_context)
+
+        provider, model = self.dspy_manager.select_route(provider, model)
+        label = f"{provider}/{model}"
+        lm = self.dspy_manager.get_pooled_lm(provider=provider, model=model, temperature=CHAT_TEMPERATURE)
+        adapter = dspy.ChatAdapter()
+        prompt = adapter.format(
+            self.signature,
+            demos=[],
+            inputs={"messages": messages, "context": context, "message": message}
+        )
+        parser = FieldStreamParser("ayla_response")
+        completion = ""
+        started = time.perf_counter()
+        first_token = None
+
+        async with self.admission.admit(provider, model, priority):
+            # Timeouts count against the route's breaker; admission rejections do not
+            with self.dspy_manager.track(provider, model):
+                async with asyncio.timeout(self.executor.timeout):
+                    stream = await litellm.acompletion(
+                        model=lm.model,
+                        messages=prompt,
+                        stream=True,
+                        num_retries=lm.num_retries,
+                        stream_options={"include_usage": True},
+                        **lm.kwargs
+                    )
+                    async for chunk in stream:
+                        if not chunk.choices:
+                            # The trailing usage-only chunk requested via stream_options
+                            continue
+                        delta = chunk.choices[0].delta.content or ""
+                        completion += delta
+                        text = parser.feed(delta)
+                        if text:
+                            if first_token is None:
+                                first_token = time.perf_counter() - started
+                                metrics.observe("ayla_llm_time_to_first_token_seconds", first_token, route=label)
+                            await on_token(text)
+
+        tail = parser.flush()
+        if tail:
+            await on_token(tail)
+        metrics.observe("ayla_llm_execution_seconds", time.perf_counter() - started, route=label)
+
+        try:
+            response = dspy.Prediction(**adapter.parse(self.signature, completion))
         except Exception as e:
-            logger.error(f"Error in get_model_response: {str(e)}")
-            raise
\ No newline at end of file
+            logger.error(f"Could not parse streamed response, retrying without streaming: {str(e)}")
+            return await self.get_model_response(
+                message=message,
+                messages=messages,
+                context=context,
+                provider=provider,
+                model=model,
+                priority=priority,
+                confirmation_context=confirmation_context
+            )
+
+        await self._set_cached(cache_key, response)
+        return self._full_response(response, confirmation_context)
@@ -0,0 +1,183 @@
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+from app.core.metrics import metrics
+from configs.logger import logger
+from configs.settings import get_settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """No route is available: every candidate provider/model has an open breaker"""
+
+
+class CircuitBreaker:
+    """
+    Health of one provider/model over its last `window` calls.
+
+    Opens when, with at least `min_calls` recorded, the error rate reaches `error_threshold`
+    or the share of calls slower than `slow_call_seconds` reaches `slow_threshold`. After
+    `cooldown` seconds it turns half-open and lets `half_open_probes` calls through: one bad
+    probe re-opens it, enough good ones close it. `clock` is injectable for tests.
+
+    Every state change starts a new `generation`. Callers pass the generation their call
+    started in to `record`, and results from an earlier one are ignored, so a call that was
+    already running when the breaker opened can neither re-open nor close it as a probe.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 20,
+        min_calls: int = 5,
+        error_threshold: float = 0.5,
+        slow_threshold: float = 0.5,
+        slow_call_seconds: float = 20.0,
+        cooldown: float = 30.0,
+        half_open_probes: int = 1,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.slow_threshold = slow_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.cooldown = cooldown
+        self.half_open_probes = half_open_probes
+        self.clock = clock
+        self.calls: deque = deque(maxlen=window)
+        self._state = CLOSED
+        self._generation = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_at = 0.0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+        metrics.set_gauge("ayla_llm_breaker_state", STATE_VALUES[CLOSED], route=name)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    @property
+    def generation(self) -> int:
+        with self._lock:
+            self._maybe_half_open()
+            return self._generation
+
+    def allow(self) -> bool:
+        """Whether a call may be sent now; in half-open state this takes a probe slot"""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state != HALF_OPEN:
+                return False
+            # A probe that never reported back (e.g. rejected before reaching the LM) expires
+            if self._probes < self.half_open_probes or self.clock() - self._probe_at >= self.cooldown:
+                self._probes = min(self._probes + 1, self.half_open_probes)
+                self._probe_at = self.clock()
+                return True
+            return False
+
+    def record(self, success: bool, latency: float, generation: Optional[int] = None):
+        """Report a finished call; `generation` is the breaker's generation when the call started"""
+        slow = latency >= self.slow_call_seconds
+        with self._lock:
+            self._maybe_half_open()
+            if generation is not None and generation != self._generation:
+                return
+            if self._state == HALF_OPEN:
+                if success and not slow:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_probes:
+                        self.calls.clear()
+                        self._transition(CLOSED)
+                else:
+                    self._open()
+                return
+
+            self.calls.append((success, slow))
+            if self._state == CLOSED and len(self.calls) >= self.min_calls:
+                errors = sum(1 for ok, _ in self.calls if not ok) / len(self.calls)
+                slow_rate = sum(1 for _, is_slow in self.calls if is_slow) / len(self.calls)
+                if errors >= self.error_threshold or slow_rate >= self.slow_threshold:
+                    logger.warning(
+                        f"Opening circuit for {self.name}: error rate {errors:.0%}, slow rate {slow_rate:.0%}"
+                    )
+                    self._open()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            self._maybe_half_open()
+            calls = len(self.calls)
+            return {
+                "state": self._state,
+                "calls": calls,
+                "error_rate": sum(1 for ok, _ in self.calls if not ok) / calls if calls else 0.0,
+                "slow_rate": sum(1 for _, slow in self.calls if slow) / calls if calls else 0.0,
+            }
+
+    def _open(self):
+        self._opened_at = self.clock()
+        self._transition(OPEN)
+
+    def _maybe_half_open(self):
+        if self._state == OPEN and self.clock() - self._opened_at >= self.cooldown:
+            self._transition(HALF_OPEN)
+
+    def _transition(self, state: str):
+        self._state = state
+        self._generation += 1
+        self._probes = 0
+        self._probe_successes = 0
+        metrics.set_gauge("ayla_llm_breaker_state", STATE_VALUES[state], route=self.name)
+        metrics.inc("ayla_llm_breaker_transitions_total", route=self.name, state=state)
+        logger.info(f"Circuit for {self.name} is now {state}")
+
+
+class BreakerRegistry:
+    """One CircuitBreaker per provider/model, all created with the same settings and clock"""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic, **config):
+        self.clock = clock
+        self.config = config
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str, model: str) -> CircuitBreaker:
+        key = (provider, model)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(key)
+                if breaker is None:
+                    breaker = CircuitBreaker(f"{provider}/{model}", clock=self.clock, **self.config)
+                    self._breakers[key] = breaker
+        return breaker
+
+    def all(self) -> List[CircuitBreaker]:
+        return list(self._breakers.values())
+
+
+@lru_cache()
+def get_breaker_registry() -> BreakerRegistry:
+    """Process-wide breakers shared by every DSPyManager instance"""
+    settings = get_settings()
+    return BreakerRegistry(
+        window=settings.LLM_BREAKER_WINDOW,
+        min_calls=settings.LLM_BREAKER_MIN_CALLS,
+        error_threshold=settings.LLM_BREAKER_ERROR_RATE,
+        slow_threshold=settings.LLM_BREAKER_SLOW_RATE,
+        slow_call_seconds=settings.LLM_BREAKER_SLOW_CALL_SECONDS,
+        cooldown=settings.LLM_BREAKER_COOLDOWN,
+        half_open_probes=settings.LLM_BREAKER_HALF_OPEN_PROBES
+    )
@@ -0,0 +1,94 @@
+import re
+import dspy
+from typing import Any, Dict, Optional, Tuple
+from app.core.metrics import metrics
+from configs.logger import logger
+
+# confirmation_context key -> ChatResponse output field
+CONTEXT_FIELDS = {
+    "product": "product_name",
+    "product_category": "product_category",
+    "quantity": "quantity",
+    "supplier_type": "supplier_type",
+    "brand": "brand",
+    "model": "model",
+    "description": "description",
+    "delivery_location": "delivery_location",
+    "preferred_delivery_timeline": "preferred_delivery_timeline",
+    "supplier_list_name": "supplier_list_name",
+}
+OUTPUT_FIELDS = {field: key for key, field in CONTEXT_FIELDS.items()}
+REQUIRED_FIELDS = ("product", "quantity", "supplier_type")
+STATUSES = {"product", "quantity", "supplier_type", "complete"}
+SUPPLIER_TYPES = {"private", "public", "both"}
+
+_INVALID = object()
+
+
+def context_prediction(context: Dict, ayla_response: str, to_ozil: bool = False) -> dspy.Prediction:
+    """A ChatResponse-shaped prediction for a full confirmation_context"""
+    return dspy.Prediction(
+        ayla_response=ayla_response,
+        to_ozil=to_ozil,
+        status=context.get("status"),
+        **{field: context.get(key) for key, field in CONTEXT_FIELDS.items()}
+    )
+
+
+def _validate(key: str, value: Any) -> Any:
+    """Normalized value for a context field, or _INVALID"""
+    if key == "quantity":
+        if isinstance(value, bool):
+            return _INVALID
+        if isinstance(value, str):
+            match = re.match(r"^\s*(\d[\d,]*)", value)
+            value = int(match.group(1).replace(",", "")) if match else None
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return value if isinstance(value, int) and value > 0 else _INVALID
+    if key == "supplier_type":
+        value = str(value).strip().lower()
+        return value if value in SUPPLIER_TYPES else _INVALID
+    value = str(value).strip()
+    return value or _INVALID
+
+
+def merge_delta(context: Dict, delta: Any) -> Tuple[Dict, bool]:
+    """
+    Apply a ChatDelta prediction to a stored confirmation_context.
+
+    Only recognised, valid fields in `delta.changes` are applied; omitted or null fields keep
+    their stored value, so a field the model forgot to repeat is never wiped. The RFQ may only
+    complete once every required field is known. Returns the new context and `to_ozil`.
+    """
+    merged = dict(context)
+    changes = delta.changes if isinstance(delta.changes, dict) else {}
+    for name, value in changes.items():
+        key = OUTPUT_FIELDS.get(name, name)
+        if key not in CONTEXT_FIELDS or value is None:
+            continue
+        value = _validate(key, value)
+        if value is _INVALID:
+            metrics.inc("ayla_delta_rejected_fields_total", field=key)
+            logger.warning(f"Ignoring invalid {key} in context delta: {changes[name]!r}")
+            continue
+        merged[key] = value
+
+    status = str(delta.status or "").strip().lower()
+    if status in STATUSES:
+        merged["status"] = status
+
+    to_ozil = bool(delta.to_ozil)
+    missing = [key for key in REQUIRED_FIELDS if merged.get(key) in (None, "")]
+    if missing and (to_ozil or merged.get("status") == "complete"):
+        metrics.inc("ayla_delta_incomplete_rfq_total")
+        logger.warning(f"Model completed an RFQ without {', '.join(missing)}; continuing the conversation")
+        merged["status"] = missing[0]
+        to_ozil = False
+    return merged, to_ozil
+
+
+def apply_delta(context: Optional[Dict], delta: Any) -> dspy.Prediction:
+    """Merge a ChatDelta prediction into `context` and return a full ChatResponse-shaped prediction"""
+    merged, to_ozil = merge_delta(context or {}, delta)
+    return context_prediction(merged, delta.ayla_response, to_ozil)
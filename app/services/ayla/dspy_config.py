@@ -1,14 +1,42 @@
-import os
+import threading
 import dspy
-from typing import Optional
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
 from configs.logger import logger
+from app.core.metrics import metrics
 from configs.settings import get_settings
+from app.services.ayla.circuit_breaker import BreakerRegistry, CircuitBreaker, CircuitOpenError, get_breaker_registry
+from app.services.ayla.llm_usage import register_usage_callback
+
+
+class BoundedHistory(list):
+    """List that keeps only the newest `maxlen` entries; used for long-lived LM.history"""
+
+    def __init__(self, maxlen: int = 100):
+        super().__init__()
+        self.maxlen = maxlen
+
+    def append(self, item):
+        super().append(item)
+        if len(self) > self.maxlen:
+            del self[:len(self) - self.maxlen]
+
+
 class DSPyManager:
-    def __init__(self):
+    # Shared by every DSPyManager instance so LM clients and predictors live for the whole process
+    _lm_pool: Dict[Tuple[str, str, float], dspy.LM] = {}
+    _predictors: Dict[Tuple[type, type], dspy.Module] = {}
+    _pool_lock = threading.Lock()
+
+    def __init__(self, breakers: Optional[BreakerRegistry] = None):
+        # Process-wide by default; tests pass their own registry, e.g. with a fake clock
+        self.breakers = breakers or get_breaker_registry()
         self.lm_configs = {
             "openai": {
                 "gpt-4o-mini": "openai/gpt-4o-mini",
-                "gpt-4o-mini": "openai/gpt-4o-mini",
+                "gpt-4o": "openai/gpt-4o",
+                # Default of AylaAgentRequest.model; served by gpt-4o
+                "gpt-4": "openai/gpt-4o",
                 "gpt-4-turbo": "openai/gpt-4-turbo-preview",
                 "gpt-3.5-turbo": "openai/gpt-3.5-turbo"
             },
@@ -29,6 +57,10 @@ class DSPyManager:
             "anthropic": get_settings().ANTHROPIC_API_KEY,
             "gemini": get_settings().GOOGLE_API_KEY
         }
+        self.failover_routes: List[Tuple[str, str]] = [
+            tuple(route.split("/", 1)) for route in get_settings().LLM_FAILOVER_ROUTES
+        ]
+        register_usage_callback()
 
     def get_lm(self, provider: str, model: str, temperature: float = 0.7) -> Optional[dspy.LM]:
         """
@@ -52,11 +84,98 @@ class DSPyManager:
         
         return None
 
+    def get_pooled_lm(self, provider: str, model: str, temperature: float = 0.7) -> dspy.LM:
+        """
+        Get a long-lived LM client for (provider, model, temperature), creating it on first use
+        """
+        key = (provider, model, temperature)
+        lm = self._lm_pool.get(key)
+        if lm is None:
+            with self._pool_lock:
+                lm = self._lm_pool.get(key)
+                if lm is None:
+                    logger.info(f"Creating pooled LM: {provider}/{model} (temperature={temperature})")
+                    lm = self.get_lm(provider, model, temperature)
+                    lm.history = BoundedHistory()
+                    self._lm_pool[key] = lm
+        return lm
+
+    def get_predictor(self, signature: type, module: type = dspy.Predict) -> dspy.Module:
+        """
+        Get a shared predictor module for a signature; predictors hold no per-request state
+        """
+        key = (signature, module)
+        predictor = self._predictors.get(key)
+        if predictor is None:
+            with self._pool_lock:
+                predictor = self._predictors.setdefault(key, module(signature))
+        return predictor
+
+    def lm_context(self, provider: str, model: str, temperature: float = 0.7):
+        """
+        Scope a pooled LM to the current thread for the duration of one request:
+
+            with dspy_manager.lm_context("openai", "gpt-4o-mini", 0.2):
+                predictor(...)
+        """
+        return dspy.context(lm=self.get_pooled_lm(provider, model, temperature))
+
     def configure_default_lm(self, provider: str = "openai", model: str = "gpt-4o-mini", temperature: float = 0.7):
         """
-        Configure the default LM for DSPy
+        Configure the default LM for DSPy.
+        Mutates global DSPy state; request handlers should use `lm_context` instead.
         """
         logger.info(f"Configuring LM: {provider}/{model}")
-        lm = self.get_lm(provider, model, temperature)
+        lm = self.get_pooled_lm(provider, model, temperature)
         dspy.configure(lm=lm)
-        return None
\ No newline at end of file
+        return None
+
+    def get_breaker(self, provider: str, model: str) -> CircuitBreaker:
+        """
+        Get the shared circuit breaker tracking the health of provider/model
+        """
+        return self.breakers.get(provider, model)
+
+    def select_route(self, provider: str, model: str) -> Tuple[str, str]:
+        """
+        Pick the requested provider/model, or the first route in LLM_FAILOVER_ROUTES whose
+        breaker allows a call. Raises CircuitOpenError if every candidate is open.
+        """
+        candidates = [(provider, model)] + [route for route in self.failover_routes if route != (provider, model)]
+        for candidate in candidates:
+            if self.get_breaker(*candidate).allow():
+                if candidate != (provider, model):
+                    logger.warning(f"Failing over from {provider}/{model} to {candidate[0]}/{candidate[1]}")
+                return candidate
+        raise CircuitOpenError(f"No healthy LLM route for {provider}/{model}")
+
+    @contextmanager
+    def track(self, provider: str, model: str):
+        """
+        Record the outcome and latency of the LM call made inside the block:
+
+            with dspy_manager.track(provider, model), dspy_manager.lm_context(provider, model):
+                predictor(...)
+        """
+        breaker = self.get_breaker(provider, model)
+        generation = breaker.generation
+        clock = self.breakers.clock
+        started = clock()
+        try:
+            yield breaker
+        except Exception:
+            self._record(breaker, generation, provider, model, False, clock() - started)
+            raise
+        self._record(breaker, generation, provider, model, True, clock() - started)
+
+    def _record(self, breaker: CircuitBreaker, generation: int, provider: str, model: str, success: bool, elapsed: float):
+        breaker.record(success, elapsed, generation)
+        metrics.observe(
+            "ayla_llm_latency_seconds", elapsed, provider=provider, model=model, outcome="ok" if success else "error"
+        )
+
+    def breaker_states(self) -> Dict[str, Dict]:
+        """
+        Current state, error rate and slow-call rate of every breaker, keyed by provider/model
+        """
+        return {breaker.name: breaker.snapshot() for breaker in self.breakers.all()}
@@ -0,0 +1,163 @@
+import re
+import dspy
+from typing import Dict, List, Optional
+from app.core.metrics import metrics
+from app.services.ayla.context_delta import REQUIRED_FIELDS, context_prediction
+
+SUMMARY_LABELS = {
+    "product": "Product Name",
+    "quantity": "Quantity",
+    "supplier_type": "Supplier Type",
+    "brand": "Brand",
+    "model": "Model",
+    "description": "Description",
+    "delivery_location": "Delivery Location",
+    "preferred_delivery_timeline": "Preferred Delivery Timeline",
+    "supplier_list_name": "Supplier List Name",
+}
+
+SUPPLIER_QUESTION = "For sourcing these {items}, would you like to receive quotes from private suppliers, public suppliers, or both?"
+OPTIONAL_QUESTION = (
+    "Would you like to provide any optional details? This includes specific brand preferences, model details, "
+    "description, delivery location, preferred delivery timeline, or supplier list name."
+)
+
+# "25", "200 reams", "50 chairs.", "1,000 units": a number plus at most three words, nothing else
+QUANTITY_PATTERN = re.compile(r"^(?:about |around )?(\d{1,3}(?:,\d{3})+|\d+)((?: [a-z][a-z-]*){0,3})$")
+# Words allowed after the number besides the product's own; anything else ("25 next week",
+# "100 from dell") goes to the model
+QUANTITY_UNITS = {
+    "unit", "units", "piece", "pieces", "pcs", "item", "items", "box", "boxes", "pack", "packs", "package",
+    "packages", "case", "cases", "carton", "cartons", "ream", "reams", "roll", "rolls", "set", "sets", "pair",
+    "pairs", "bottle", "bottles", "bag", "bags", "kit", "kits", "license", "licenses", "licence", "licences",
+    "seat", "seats", "copy", "copies", "sheet", "sheets",
+}
+QUANTITY_FILLER = {"of", "in", "total"}
+# Scale words change the number ("25 thousand", "2 dozen"); never guess those
+QUANTITY_MULTIPLIERS = {"hundred", "thousand", "million", "billion", "k", "m", "mm", "bn", "dozen", "dozens", "grand", "lakh", "crore"}
+SUPPLIER_FILLER = {"only", "just", "suppliers", "supplier", "and", "the", "from", "please", "i", "we", "want", "would", "like", "quotes", "prefer", "go", "with", "sources", "of", "them"}
+# The whole optional-details reply must be a refusal: "no", "nope, that's all I need", "nothing else thanks"
+OPT_OUT_PHRASES = ("thats all i need", "that is all i need", "thats all", "that is all", "thats it", "nothing else", "im good", "were good", "all good")
+OPT_OUT_NEGATIVES = {"no", "nope", "nah", "none", "nothing"}
+OPT_OUT_POLITE = {"thanks", "thank", "you", "please", "ok", "okay", "fine", "proceed", "for", "now"}
+
+
+def _normalize(text: str) -> str:
+    text = text.lower().replace("’", "'")
+    text = re.sub(r"[^\w\s',.-]", " ", text)
+    return " ".join(text.split()).rstrip(" .")
+
+
+def _words(text: str) -> List[str]:
+    return re.sub(r"[,.-]", " ", text).split()
+
+
+def _singular(word: str) -> str:
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("ches", "shes", "sses", "xes", "zes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+class FastPathExtractor:
+    """
+    Deterministic replies for turns that only fill the slot just asked about.
+
+    Handles a bare quantity while status is `quantity`, a plain supplier type while status is
+    `supplier_type`, and a plain "no" to the optional-details question once every required
+    field is known. Anything ambiguous returns None and goes to the model.
+    """
+
+    def reply(self, message: str, confirmation_context: Dict, messages: List[Dict]) -> Optional[dspy.Prediction]:
+        text = _normalize(message)
+        status = confirmation_context.get("status")
+
+        prediction, rule = None, None
+        if status == "quantity" and confirmation_context.get("product") and confirmation_context.get("quantity") is None:
+            prediction, rule = self._quantity(text, confirmation_context), "quantity"
+        elif status == "supplier_type" and confirmation_context.get("supplier_type") is None:
+            prediction, rule = self._supplier_type(text, confirmation_context), "supplier_type"
+        elif self._required_known(confirmation_context) and self._asked_optional(messages):
+            prediction, rule = self._opt_out(text, confirmation_context), "opt_out"
+
+        metrics.inc("ayla_fast_path_checks_total")
+        if prediction is not None:
+            metrics.inc("ayla_fast_path_hits_total")
+            metrics.inc("ayla_fast_path_rule_hits_total", rule=rule)
+        metrics.set_gauge(
+            "ayla_fast_path_hit_ratio",
+            metrics.get_counter("ayla_fast_path_hits_total") / metrics.get_counter("ayla_fast_path_checks_total")
+        )
+        return prediction
+
+    def _quantity(self, text: str, context: Dict) -> Optional[dspy.Prediction]:
+        match = QUANTITY_PATTERN.match(text)
+        if not match:
+            return None
+        quantity = int(match.group(1).replace(",", ""))
+        if quantity <= 0:
+            return None
+        words = match.group(2).split()
+        product = context["product"]
+        product_words = {_singular(word) for word in _words(_normalize(product))}
+        if words and words[-1] in QUANTITY_FILLER:
+            return None
+        if any(word in QUANTITY_MULTIPLIERS for word in words):
+            return None
+        if not all(word in QUANTITY_UNITS or word in QUANTITY_FILLER or _singular(word) in product_words for word in words):
+            return None
+        # "200 reams of A4 paper", but "50 chairs" rather than "50 chairs of office chairs"
+        units = [word for word in words if word in QUANTITY_UNITS and _singular(word) not in product_words]
+        items = f"{quantity} {' '.join(units)} of {product}" if units else f"{quantity} {product}"
+        return self._prediction(
+            context,
+            {"quantity": quantity, "status": "supplier_type"},
+            SUPPLIER_QUESTION.format(items=items)
+        )
+
+    def _supplier_type(self, text: str, context: Dict) -> Optional[dspy.Prediction]:
+        words = set(_words(text)) - SUPPLIER_FILLER
+        if not words or not words <= {"both", "private", "public"}:
+            return None
+        if "both" in words or words == {"private", "public"}:
+            supplier_type = "both"
+        else:
+            supplier_type = words.pop()
+        return self._prediction(context, {"supplier_type": supplier_type, "status": "supplier_type"}, OPTIONAL_QUESTION)
+
+    def _opt_out(self, text: str, context: Dict) -> Optional[dspy.Prediction]:
+        text = " " + " ".join(_words(text.replace("'", ""))) + " "
+        refused = False
+        for phrase in OPT_OUT_PHRASES:
+            if f" {phrase} " in text:
+                text = text.replace(f" {phrase} ", " ")
+                refused = True
+        words = set(text.split())
+        refused = refused or bool(words & OPT_OUT_NEGATIVES)
+        if not refused or not words <= OPT_OUT_NEGATIVES | OPT_OUT_POLITE:
+            return None
+        summary = "\n".join(
+            f"{label}: {context[key]}" for key, label in SUMMARY_LABELS.items() if context.get(key) not in (None, "")
+        )
+        return self._prediction(
+            context,
+            {"status": "complete"},
+            f"I'll process this request with the following details:\n\n{summary}",
+            to_ozil=True
+        )
+
+    @staticmethod
+    def _required_known(context: Dict) -> bool:
+        return all(context.get(key) not in (None, "") for key in REQUIRED_FIELDS)
+
+    @staticmethod
+    def _asked_optional(messages: List[Dict]) -> bool:
+        last = next((m["content"] for m in reversed(messages) if m["role"] == "assistant"), "")
+        return "optional" in last.lower()
+
+    @staticmethod
+    def _prediction(context: Dict, update: Dict, ayla_response: str, to_ozil: bool = False) -> dspy.Prediction:
+        return context_prediction({**context, **update}, ayla_response, to_ozil)
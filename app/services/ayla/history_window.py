@@ -0,0 +1,61 @@
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Per-message overhead used by OpenAI chat formats (role + separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    if tiktoken is None:
+        return None
+    if not model:
+        return tiktoken.get_encoding("cl100k_base")
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """Count tokens with the model's tokenizer, or approximate at ~4 chars/token without tiktoken"""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def window_messages(
+    messages: List[Dict[str, str]],
+    token_budget: int,
+    max_messages: int,
+    min_messages: int = 2,
+    model: str = "gpt-4o-mini"
+) -> Tuple[List[Dict[str, str]], int]:
+    """
+    Keep the newest messages that fit in `token_budget` (at most `max_messages`).
+
+    The `min_messages` most recent messages are always kept so the model sees the question it
+    is answering, even if that alone exceeds the budget. Returns the kept messages in their
+    original order and the number of tokens dropped.
+    """
+    kept = []
+    used = 0
+    dropped = 0
+    full = False
+    for index, msg in enumerate(reversed(messages)):
+        tokens = count_tokens(msg["content"], model) + MESSAGE_OVERHEAD_TOKENS
+        if not full and (index < min_messages or (len(kept) < max_messages and used + tokens <= token_budget)):
+            kept.append(msg)
+            used += tokens
+        else:
+            # Never skip a message and keep an older one: the window stays contiguous
+            full = True
+            dropped += tokens
+    kept.reverse()
+    return kept, dropped
@@ -0,0 +1,71 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Optional
+from app.core.metrics import metrics
+from configs.logger import logger
+from configs.settings import get_settings
+
+
+class LLMExecutor:
+    """
+    Bounded thread pool dedicated to blocking DSPy/LM calls.
+
+    DSPy modules are synchronous, so running them directly inside a coroutine freezes the
+    event loop for the whole LLM round trip. Calls submitted here run on their own worker
+    threads; at most `max_workers + max_queue` calls are admitted at once and further callers
+    wait on the event loop (not on a thread) until a slot frees up.
+    """
+
+    def __init__(self, max_workers: int = 16, max_queue: int = 64, timeout: float = 60.0):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ayla-llm")
+        self._slots = asyncio.Semaphore(max_workers + max_queue)
+
+    async def run(self, func: Callable[..., Any], *args, label: str = "default", timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Run `func(*args, **kwargs)` on the pool and await its result.
+
+        Raises TimeoutError if the call (queue wait included) exceeds `timeout` seconds. A call
+        that already started keeps its worker thread until the LM returns; only the result is dropped.
+        """
+        timeout = timeout or self.timeout
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+
+        def call():
+            started = time.perf_counter()
+            metrics.observe("ayla_llm_queue_wait_seconds", started - submitted, route=label)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.observe("ayla_llm_execution_seconds", time.perf_counter() - started, route=label)
+
+        try:
+            async with asyncio.timeout(timeout):
+                async with self._slots:
+                    metrics.add_gauge("ayla_llm_in_flight", 1)
+                    try:
+                        return await loop.run_in_executor(self._pool, call)
+                    finally:
+                        metrics.add_gauge("ayla_llm_in_flight", -1)
+        except TimeoutError:
+            metrics.inc("ayla_llm_timeouts_total", route=label)
+            logger.error(f"LLM call timed out after {timeout}s: {label}")
+            raise TimeoutError(f"LLM call timed out after {timeout}s")
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+@lru_cache()
+def get_llm_executor() -> LLMExecutor:
+    """Process-wide executor shared by every AylaModelManager instance"""
+    settings = get_settings()
+    return LLMExecutor(
+        max_workers=settings.LLM_EXECUTOR_MAX_WORKERS,
+        max_queue=settings.LLM_EXECUTOR_MAX_QUEUE,
+        timeout=settings.LLM_CALL_TIMEOUT
+    )
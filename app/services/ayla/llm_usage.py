@@ -0,0 +1,58 @@
+import threading
+import litellm
+from typing import Any, Dict
+from app.core.metrics import metrics
+from configs.logger import logger
+
+_registered = False
+_register_lock = threading.Lock()
+
+
+def _get(obj: Any, name: str, default: Any = None) -> Any:
+    if obj is None:
+        return default
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+def extract_usage(response: Any) -> Dict[str, int]:
+    """Normalize provider usage data, including prompt-cache reads, from a LiteLLM response"""
+    usage = _get(response, "usage")
+    details = _get(usage, "prompt_tokens_details")
+    # OpenAI reports cached prefix tokens in prompt_tokens_details, Anthropic as cache_read_input_tokens
+    cached = _get(details, "cached_tokens") or _get(usage, "cache_read_input_tokens") or 0
+    return {
+        "prompt_tokens": _get(usage, "prompt_tokens") or 0,
+        "completion_tokens": _get(usage, "completion_tokens") or 0,
+        "cached_tokens": cached,
+    }
+
+
+def record_usage(kwargs: Dict, completion_response: Any, start_time: Any, end_time: Any):
+    """LiteLLM success callback: count prompt, completion and cached prompt tokens and cost per model"""
+    try:
+        model = kwargs.get("model", "unknown")
+        usage = extract_usage(completion_response)
+        if not usage["prompt_tokens"]:
+            return
+        metrics.inc("ayla_llm_requests_total", model=model)
+        metrics.inc("ayla_llm_prompt_tokens_total", usage["prompt_tokens"], model=model)
+        metrics.inc("ayla_llm_completion_tokens_total", usage["completion_tokens"], model=model)
+        # LiteLLM prices the call from its model cost map; unknown models report no cost
+        if kwargs.get("response_cost"):
+            metrics.inc("ayla_llm_cost_usd_total", kwargs["response_cost"], model=model)
+        if usage["cached_tokens"]:
+            metrics.inc("ayla_llm_prompt_cache_hits_total", model=model)
+            metrics.inc("ayla_llm_cached_prompt_tokens_total", usage["cached_tokens"], model=model)
+    except Exception as e:
+        logger.error(f"Error recording LLM usage: {str(e)}")
+
+
+def register_usage_callback():
+    """Attach `record_usage` to LiteLLM once per process"""
+    global _registered
+    with _register_lock:
+        if not _registered:
+            litellm.success_callback = [*litellm.success_callback, record_usage]
+            _registered = True
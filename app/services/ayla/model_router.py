@@ -0,0 +1,62 @@
+import re
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional
+from app.core.metrics import metrics
+from app.services.ayla.context_delta import REQUIRED_FIELDS
+from configs.settings import get_settings
+
+
+class Route(NamedTuple):
+    name: str
+    provider: str
+    model: str
+    kind: str = "default"
+
+
+class ModelRouter:
+    """
+    Picks the model for each turn from the conversation status and the message.
+
+    `routes` names the available models ({"fast": "openai/gpt-4o-mini", ...}) and `table` maps
+    a turn kind to a route name. Turn kinds are the confirmation_context status ("product",
+    "quantity", "supplier_type", ...), "confirmation" once every required detail is known, and
+    "complex" for long or multi-part messages; "default" covers anything else.
+
+    The selected route replaces the provider/model of the request, including one the client
+    chose explicitly.
+    """
+
+    def __init__(self, routes: Dict[str, str], table: Dict[str, str], complex_words: int = 25):
+        self.routes = {name: Route(name, *target.split("/", 1)) for name, target in routes.items()}
+        self.table = table
+        self.complex_words = complex_words
+
+    def kind(self, confirmation_context: Dict, message: str) -> str:
+        if self._is_complex(message):
+            return "complex"
+        if all(confirmation_context.get(key) not in (None, "") for key in REQUIRED_FIELDS):
+            return "confirmation"
+        return confirmation_context.get("status") or "product"
+
+    def select(self, confirmation_context: Dict, message: str) -> Route:
+        kind = self.kind(confirmation_context, message)
+        name = self.table.get(kind) or self.table["default"]
+        return self.routes[name]._replace(kind=kind)
+
+    def observe(self, route: Route, seconds: float):
+        """Count a model call made on `route` and its latency"""
+        metrics.inc("ayla_llm_route_turns_total", route=route.name, kind=route.kind, model=f"{route.provider}/{route.model}")
+        metrics.observe("ayla_llm_route_latency_seconds", seconds, route=route.name)
+
+    def _is_complex(self, message: str) -> bool:
+        sentences = [part for part in re.split(r"[.!?\n]+", message) if part.strip()]
+        return len(message.split()) > self.complex_words or len(sentences) > 2
+
+
+@lru_cache()
+def get_model_router() -> Optional[ModelRouter]:
+    """Process-wide router, or None when LLM_ROUTING_ENABLED is off"""
+    settings = get_settings()
+    if not settings.LLM_ROUTING_ENABLED:
+        return None
+    return ModelRouter(settings.LLM_ROUTES, settings.LLM_ROUTING_TABLE, settings.LLM_ROUTER_COMPLEX_WORDS)
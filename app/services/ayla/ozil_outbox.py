@@ -0,0 +1,182 @@
+import asyncio
+import random
+from datetime import datetime, timedelta, UTC
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, ReturnDocument
+from app.core.metrics import metrics
+from app.core.tracing import span
+from configs.logger import logger
+from configs.settings import Settings
+
+OUTBOX_COLLECTION = "ozil_outbox"
+
+
+class OzilOutbox:
+    """
+    Durable queue of completed RFQs waiting to be dispatched to Ozil.
+
+    Entries are keyed by an idempotency key (the conversation id), so enqueuing the same RFQ
+    twice is a no-op and Ozil receives the key to de-duplicate retried deliveries. Workers
+    claim entries by pushing `next_attempt_at` forward by a lease; an entry whose worker died
+    becomes claimable again once the lease expires. Workers only claim entries once a delivery
+    function is attached.
+    """
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        send: Optional[Callable[[Dict[str, Any]], Awaitable[Any]]] = None,
+        workers: int = 4,
+        batch_size: int = 10,
+        max_attempts: int = 8,
+        lease_seconds: float = 60.0,
+        poll_interval: float = 5.0
+    ):
+        self.collection = db[OUTBOX_COLLECTION]
+        self.send = send
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.lease = timedelta(seconds=lease_seconds)
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    async def enqueue(self, key: str, message: Dict[str, Any]):
+        """Store an RFQ for delivery; safe to call again with the same key"""
+        now = datetime.now(UTC)
+        await self.collection.update_one(
+            {"_id": key},
+            {"$setOnInsert": {
+                "message": message,
+                "status": "pending",
+                "attempts": 0,
+                "created_at": now,
+                "next_attempt_at": now
+            }},
+            upsert=True
+        )
+        self._wakeup.set()
+
+    def attach(self, send: Callable[[Dict[str, Any]], Awaitable[Any]]):
+        """Set the delivery function unless one is already set"""
+        if self.send is None:
+            self.send = send
+            self._wakeup.set()
+
+    def start(self):
+        """
+        Start the worker pool once, from a running event loop; also resumes entries left over
+        from a previous process. Until then enqueued entries wait in Mongo.
+        """
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self):
+        while True:
+            try:
+                batch = await self._claim() if self.send is not None else []
+                if batch:
+                    await asyncio.gather(*(self._deliver(entry) for entry in batch))
+                    continue
+            except Exception as e:
+                logger.error(f"Ozil outbox worker error: {str(e)}")
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim(self) -> List[Dict]:
+        batch = []
+        for _ in range(self.batch_size):
+            now = datetime.now(UTC)
+            entry = await self.collection.find_one_and_update(
+                {"status": {"$in": ["pending", "processing"]}, "next_attempt_at": {"$lte": now}},
+                {"$set": {"status": "processing", "next_attempt_at": now + self.lease}, "$inc": {"attempts": 1}},
+                sort=[("next_attempt_at", ASCENDING)],
+                return_document=ReturnDocument.AFTER
+            )
+            if entry is None:
+                break
+            batch.append(entry)
+        return batch
+
+    async def _deliver(self, entry: Dict):
+        try:
+            with span("ozil.deliver", attempt=entry["attempts"]):
+                await self.send({**entry["message"], "idempotency_key": entry["_id"]})
+        except Exception as e:
+            await self._fail(entry, str(e))
+            return
+
+        await self.collection.update_one(
+            {"_id": entry["_id"]},
+            {"$set": {"status": "delivered", "delivered_at": datetime.now(UTC)}}
+        )
+        metrics.inc("ayla_ozil_outbox_delivered_total")
+
+    async def _fail(self, entry: Dict, error: str):
+        if entry["attempts"] >= self.max_attempts:
+            logger.error(f"Giving up on Ozil RFQ {entry['_id']} after {entry['attempts']} attempts: {error}")
+            update = {"status": "failed", "last_error": error}
+            metrics.inc("ayla_ozil_outbox_failed_total")
+        else:
+            delay = random.uniform(0, min(300, 2 ** entry["attempts"]))
+            logger.warning(f"Ozil RFQ {entry['_id']} delivery failed, retrying in {delay:.1f}s: {error}")
+            update = {
+                "status": "pending",
+                "last_error": error,
+                "next_attempt_at": datetime.now(UTC) + timedelta(seconds=delay)
+            }
+            metrics.inc("ayla_ozil_outbox_retries_total")
+        await self.collection.update_one({"_id": entry["_id"]}, {"$set": update})
+
+
+_outbox: Optional[OzilOutbox] = None
+
+
+def _create_outbox(db: AsyncIOMotorDatabase, settings: Settings) -> OzilOutbox:
+    return OzilOutbox(
+        db,
+        workers=settings.OZIL_OUTBOX_WORKERS,
+        batch_size=settings.OZIL_OUTBOX_BATCH_SIZE,
+        max_attempts=settings.OZIL_OUTBOX_MAX_ATTEMPTS
+    )
+
+
+def init_ozil_outbox(db: AsyncIOMotorDatabase, settings: Settings) -> OzilOutbox:
+    """
+    Create and start the process-wide outbox; called once from the app lifespan. Deliveries
+    begin once the first AylaAgentService attaches its sender.
+    """
+    global _outbox
+    _outbox = _create_outbox(db, settings)
+    _outbox.start()
+    return _outbox
+
+
+def get_ozil_outbox(db: AsyncIOMotorDatabase, settings: Settings, send: Callable[[Dict[str, Any]], Awaitable[Any]]) -> OzilOutbox:
+    """
+    Process-wide outbox with `send` attached. Outside the app (scripts, tests) one is created
+    without workers; enqueued entries then wait in Mongo until a process calls `start()`.
+    """
+    global _outbox
+    if _outbox is None:
+        _outbox = _create_outbox(db, settings)
+    _outbox.attach(send)
+    return _outbox
+
+
+async def stop_ozil_outbox():
+    """Stop the process-wide outbox's workers, if one was created; called from the app lifespan"""
+    if _outbox is not None:
+        await _outbox.stop()
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+from cachetools import TTLCache
+from app.core.metrics import metrics
+from configs.logger import logger
+from configs.settings import get_settings
+
+_whitespace = re.compile(r"\s+")
+
+
+def _normalize(text: str) -> str:
+    return _whitespace.sub(" ", (text or "").strip().lower())
+
+
+class ResponseCache:
+    """
+    Exact-match cache for model responses.
+
+    Lookups go to an in-process LRU (with TTL) first, then to Redis when a client is configured.
+    Values are the plain dict form of a prediction so they can be shared across workers.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: int = 3600, redis_client: Any = None, prefix: str = "ayla:response:"):
+        self.ttl = ttl
+        self.prefix = prefix
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.redis = redis_client
+
+    @staticmethod
+    def make_key(namespace: str, provider: str, model: str, temperature: float, context: str, messages: List[Dict], message: str) -> str:
+        """Hash the request after normalizing whitespace and case of the free-text parts"""
+        payload = json.dumps(
+            {
+                "namespace": namespace,
+                "provider": provider,
+                "model": model,
+                "temperature": temperature,
+                "context": context,
+                "messages": [{"role": m["role"], "content": _normalize(m["content"])} for m in messages],
+                "message": _normalize(message),
+            },
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict]:
+        value = self.memory.get(key)
+        if value is not None:
+            metrics.inc("ayla_response_cache_hits_total", tier="memory")
+            return value
+
+        if self.redis is not None:
+            try:
+                raw = await self.redis.get(self.prefix + key)
+            except Exception as e:
+                logger.error(f"Response cache Redis get failed: {str(e)}")
+                raw = None
+            if raw is not None:
+                value = json.loads(raw)
+                self.memory[key] = value
+                metrics.inc("ayla_response_cache_hits_total", tier="redis")
+                return value
+
+        metrics.inc("ayla_response_cache_misses_total")
+        return None
+
+    async def set(self, key: str, value: Dict):
+        self.memory[key] = value
+        if self.redis is not None:
+            try:
+                await self.redis.set(self.prefix + key, json.dumps(value), ex=self.ttl)
+            except Exception as e:
+                logger.error(f"Response cache Redis set failed: {str(e)}")
+
+
+@lru_cache()
+def get_response_cache() -> Optional[ResponseCache]:
+    """Process-wide response cache, or None when RESPONSE_CACHE_ENABLED is off"""
+    settings = get_settings()
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return None
+
+    redis_client = None
+    if settings.RESPONSE_CACHE_USE_REDIS and settings.REDIS_URL:
+        import redis.asyncio as redis
+        redis_client = redis.Redis.from_url(settings.REDIS_URL)
+
+    return ResponseCache(
+        maxsize=settings.RESPONSE_CACHE_MAXSIZE,
+        ttl=settings.RESPONSE_CACHE_TTL,
+        redis_client=redis_client
+    )
@@ -0,0 +1,62 @@
+FIELD_HEADER_START = "[[ ##"
+
+
+class FieldStreamParser:
+    """
+    Incrementally extracts one output field from a streamed ChatAdapter completion.
+
+    ChatAdapter completions look like `[[ ## ayla_response ## ]]\\n...\\n\\n[[ ## to_ozil ## ]]\\n...`.
+    `feed` returns only the text of the watched field that is safe to show, holding back
+    trailing whitespace and anything that could be the start of the next field header.
+    """
+
+    def __init__(self, field: str):
+        self.header = f"[[ ## {field} ## ]]"
+        self.buffer = ""
+        self.in_field = False
+        self.finished = False
+        self.started = False
+
+    def feed(self, text: str) -> str:
+        if self.finished:
+            return ""
+
+        self.buffer += text
+        if not self.in_field:
+            index = self.buffer.find(self.header)
+            if index == -1:
+                return ""
+            self.buffer = self.buffer[index + len(self.header):]
+            self.in_field = True
+
+        end = self.buffer.find(FIELD_HEADER_START)
+        if end != -1:
+            out = self.buffer[:end].rstrip()
+            self.buffer = ""
+            self.in_field = False
+            self.finished = True
+        else:
+            hold = self._partial_header_length()
+            safe = self.buffer[:len(self.buffer) - hold]
+            out = safe.rstrip()
+            self.buffer = safe[len(out):] + self.buffer[len(self.buffer) - hold:]
+
+        if not self.started:
+            out = out.lstrip()
+            self.started = bool(out)
+        return out
+
+    def flush(self) -> str:
+        """Return whatever is still held back once the stream has ended"""
+        if self.finished or not self.in_field:
+            return ""
+        out = self.buffer.strip() if not self.started else self.buffer.rstrip()
+        self.buffer = ""
+        self.finished = True
+        return out
+
+    def _partial_header_length(self) -> int:
+        for size in range(min(len(FIELD_HEADER_START) - 1, len(self.buffer)), 0, -1):
+            if FIELD_HEADER_START.startswith(self.buffer[-size:]):
+                return size
+        return 0
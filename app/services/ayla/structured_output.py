@@ -0,0 +1,42 @@
+import dspy
+from typing import Any, Dict, Type
+from pydantic import Field, create_model
+
+REASONING_FIELD = dspy.OutputField(desc="Brief step-by-step reasoning before answering")
+
+
+class StructuredOutputError(ValueError):
+    """The completion did not match the signature's schema"""
+
+
+def response_format(signature: Type[dspy.Signature]) -> Dict[str, Any]:
+    """
+    JSON-schema `response_format` for a signature's output fields. LiteLLM sends it as a native
+    structured output on OpenAI/Gemini and as a forced tool call on Anthropic. Kept as a plain
+    dict (not a pydantic class) so it stays serializable for the LM request cache.
+    """
+    fields = {
+        name: (field.annotation, Field(description=(field.json_schema_extra or {}).get("desc")))
+        for name, field in signature.output_fields.items()
+    }
+    model = create_model(f"{signature.__name__}Output", **fields)
+    return {"type": "json_schema", "json_schema": {"name": model.__name__, "schema": model.model_json_schema()}}
+
+
+def with_reasoning(signature: Type[dspy.Signature]) -> Type[dspy.Signature]:
+    """The signature with a leading `reasoning` output, like ChainOfThought adds"""
+    return signature.prepend("reasoning", REASONING_FIELD, str)
+
+
+def structured_predict(lm: dspy.LM, signature: Type[dspy.Signature], inputs: Dict, schema: Dict[str, Any]) -> dspy.Prediction:
+    """
+    One LM call constrained to `schema`, parsed with the JSON adapter. Raises
+    StructuredOutputError if the completion does not parse; there is no silent retry.
+    """
+    adapter = dspy.JSONAdapter()
+    prompt = adapter.format(signature, demos=[], inputs=inputs)
+    completion = lm(messages=prompt, response_format=schema)[0]
+    try:
+        return dspy.Prediction(**adapter.parse(signature, completion))
+    except Exception as e:
+        raise StructuredOutputError(str(e)) from e
@@ -2,11 +2,12 @@ from datetime import datetime, UTC
 from typing import Dict, Optional
 from bson.objectid import ObjectId
 from motor.motor_asyncio import AsyncIOMotorClient
-from config.settings import Settings
+from configs.settings import Settings
 from app.chains.rfq_chain import RFQChain
 from app.core.socket_manager import socket_manager
+from app.core.message_store import MessageLogError, MessageStore
+from app.core.http_clients import get_http_clients
 import logging
-import aiohttp
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +16,7 @@ class AylaService:
         self.db = db
         self.settings = settings
         self.rfq_chain = RFQChain()
+        self.message_store = MessageStore(db, window=settings.CONVERSATION_WINDOW_MESSAGES)
 
     async def get_active_conversation(self, user_id: str) -> Optional[Dict]:
         """Get most recent incomplete conversation"""
@@ -30,7 +32,8 @@ class AylaService:
             "status": "active",
             "created_at": datetime.now(UTC),
             "updated_at": datetime.now(UTC),
-            "messages": [],
+            "recent_messages": [],
+            "message_count": 0,
             "context": {
                 "status": "start",
                 "product": None,
@@ -48,20 +51,16 @@ class AylaService:
 
     async def save_message(self, conversation_id: str, content: str, sender: str):
         """Save message to conversation history"""
-        await self.db.conversations.update_one(
-            {"_id": ObjectId(conversation_id)},
-            {
-                "$push": {"messages": {
-                    "content": content,
-                    "sender": sender,
-                    "timestamp": datetime.now(UTC)
-                }},
-                "$set": {"updated_at": datetime.now(UTC)}
-            }
-        )
+        await self.message_store.append(conversation_id, [{
+            "content": content,
+            "sender": sender,
+            "timestamp": datetime.now(UTC)
+        }])
 
     async def handle_message(self, user_id: str, message: str, provider: str = "openai"):
         """Process incoming message"""
+        conversation_id = None
+        user_message = {"content": message, "sender": "user", "timestamp": datetime.now(UTC)}
         try:
             # Get or create conversation
             conversation = await self.get_active_conversation(user_id)
@@ -73,16 +72,13 @@ class AylaService:
             else:
                 conversation_id = str(conversation["_id"])
 
-            # Save user message
-            await self.save_message(conversation_id, message, "user")
-
             # Format chat history
             chat_history = [
                 {
                     "role": msg["sender"],
                     "content": msg["content"]
                 }
-                for msg in conversation["messages"]
+                for msg in MessageStore.recent(conversation)
             ]
 
             # Process with LangChain
@@ -92,30 +88,25 @@ class AylaService:
                 context=conversation["context"]
             )
 
-            # Save AI response
-            await self.save_message(conversation_id, response.response, "ai")
-
+            # Save both messages and the new context in a single atomic update
+            update = {"context": response.dict()}
             if response.to_rfq:
-                # Update conversation as complete
-                await self.db.conversations.update_one(
-                    {"_id": ObjectId(conversation_id)},
-                    {"$set": {
-                        "status": "complete",
-                        "completed_at": datetime.now(UTC),
-                        "context": response.dict()
-                    }}
+                update.update({"status": "complete", "completed_at": datetime.now(UTC)})
+            try:
+                await self.message_store.append(
+                    conversation_id,
+                    [user_message, {"content": response.response, "sender": "ai", "timestamp": datetime.now(UTC)}],
+                    set_fields=update
                 )
+            except MessageLogError as e:
+                # The conversation update landed, so the turn stands; only the full log is missing it
+                logger.error(str(e))
+            user_message = None
 
+            if response.to_rfq:
                 # Create RFQ
                 await self.create_rfq(user_id, response)
 
-            else:
-                # Update context
-                await self.db.conversations.update_one(
-                    {"_id": ObjectId(conversation_id)},
-                    {"$set": {"context": response.dict()}}
-                )
-
             # Send response to user
             await socket_manager.send_message(
                 user_id,
@@ -128,6 +119,8 @@ class AylaService:
 
         except Exception as e:
             logger.error(f"Error processing message: {str(e)}")
+            if conversation_id and user_message:
+                await self.message_store.append(conversation_id, [user_message])
             await socket_manager.send_message(
                 user_id,
                 {
@@ -139,13 +132,12 @@ class AylaService:
 
     async def create_rfq(self, user_id: str, response: Dict):
         """Create RFQ in backend system"""
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.settings.OZIL_SERVICE_URL}/rfqs",
-                json={
-                    "user_id": user_id,
-                    **response.dict()
-                }
-            ) as resp:
-                if resp.status != 201:
-                    raise Exception("Failed to create RFQ")
\ No newline at end of file
+        resp = await get_http_clients().get("ozil").post(
+            "/rfqs",
+            json={
+                "user_id": user_id,
+                **response.dict()
+            }
+        )
+        if resp.status != 201:
+            raise Exception("Failed to create RFQ")
\ No newline at end of file
@@ -0,0 +1,133 @@
+"""
+Deterministic, offline stand-in for a chat model.
+
+FakeLM answers each call from recorded conversation fixtures (benchmarks/fixtures/conversations.json),
+keyed by the user message, after a configurable delay. Replies are rendered in whatever format
+the caller's adapter asked for: `[[ ## field ## ]]` sections for the chat adapter, or a JSON
+object for the JSON adapter or when a `response_format` is passed. Messages with no recorded
+reply get FALLBACK_REPLY and are counted in `fallbacks`. Install it with `install_fake_lm` to
+serve every pooled provider/model.
+"""
+import json
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import dspy
+from pydantic import BaseModel
+from app.services.ayla.context_delta import OUTPUT_FIELDS
+from app.services.ayla.dspy_config import BoundedHistory, DSPyManager
+from configs.logger import logger
+
+FIXTURES = Path(__file__).parent / "fixtures" / "conversations.json"
+
+# Output fields parsed as plain strings; everything else is rendered as JSON
+TEXT_FIELDS = {"ayla_response", "status", "reasoning"}
+
+FALLBACK_REPLY = {
+    "ayla_response": "Could you tell me a bit more about the product you need?",
+    "to_ozil": False,
+    "status": "product",
+}
+
+_HEADER = re.compile(r"\[\[ ## (\w+) ## \]\]")
+_FIELD_NAME = re.compile(r"`(\w+)`")
+# The closing instruction ChatAdapter / JSONAdapter append after the input fields
+_CHAT_INSTRUCTIONS = "Respond with the corresponding output fields"
+_JSON_INSTRUCTIONS = "Respond with a JSON object"
+_INSTRUCTIONS = re.compile(f"({_CHAT_INSTRUCTIONS}|{_JSON_INSTRUCTIONS})")
+
+
+def load_fixtures(path: Path = FIXTURES) -> Dict:
+    """{"conversations": [{"name", "turns": [{"message", "response"}]}], "callbacks": {...}}"""
+    with open(path) as f:
+        return json.load(f)
+
+
+class FakeLM(dspy.LM):
+    """
+    `latency` seconds per call plus up to `jitter` more, drawn from a seeded generator so runs
+    are repeatable. The delay blocks the calling thread, like a synchronous provider call.
+    """
+
+    def __init__(self, conversations: List[Dict], latency: float = 0.5, jitter: float = 0.0, seed: int = 0):
+        super().__init__("openai/fake-ayla", cache=False)
+        self.responses = {
+            turn["message"].strip(): turn["response"]
+            for conversation in conversations
+            for turn in conversation["turns"]
+        }
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = 0
+        self.fallbacks = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt: Optional[str] = None, messages: Optional[List[Dict]] = None, **kwargs) -> List[str]:
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+        time.sleep(delay)
+
+        messages = messages or [{"role": "user", "content": prompt}]
+        body, marker, instructions = (_INSTRUCTIONS.split(messages[-1]["content"], maxsplit=1) + ["", ""])[:3]
+        inputs = self._sections(body)
+        message = inputs.get("message", "").strip()
+        reply = self.responses.get(message)
+        if reply is None:
+            with self._lock:
+                self.fallbacks += 1
+            logger.warning(f"FakeLM has no recorded reply for {message!r}; sending the fallback reply")
+            reply = FALLBACK_REPLY
+
+        response_format = kwargs.get("response_format")
+        fields = self._output_fields(response_format, marker, instructions, messages, inputs)
+        if response_format or marker == _JSON_INSTRUCTIONS:
+            return [json.dumps({field: self._value(field, reply) for field in fields})]
+        sections = [f"[[ ## {field} ## ]]\n{self._render(field, self._value(field, reply))}" for field in fields]
+        return ["\n\n".join(sections + ["[[ ## completed ## ]]"])]
+
+    @staticmethod
+    def _output_fields(response_format: Any, marker: str, instructions: str, messages: List[Dict], inputs: Dict) -> List[str]:
+        """Output field names, in order: from the JSON schema if there is one, else the closing instruction"""
+        if isinstance(response_format, dict) and "json_schema" in response_format:
+            return list(response_format["json_schema"]["schema"]["properties"])
+        if isinstance(response_format, type) and issubclass(response_format, BaseModel):
+            return list(response_format.model_fields)
+        if marker == _JSON_INSTRUCTIONS:
+            return list(dict.fromkeys(_FIELD_NAME.findall(instructions)))
+        if marker == _CHAT_INSTRUCTIONS:
+            return [field for field in dict.fromkeys(_HEADER.findall(instructions)) if field != "completed"]
+        system = messages[0]["content"] if messages[0]["role"] == "system" else ""
+        return [field for field in dict.fromkeys(_HEADER.findall(system)) if field not in inputs and field != "completed"]
+
+    @staticmethod
+    def _sections(text: str) -> Dict[str, str]:
+        parts = _HEADER.split(text)
+        return {name: body.strip() for name, body in zip(parts[1::2], parts[2::2])}
+
+    @staticmethod
+    def _value(field: str, reply: Dict[str, Any]) -> Any:
+        if field == "changes":
+            return {name: value for name, value in reply.items() if name in OUTPUT_FIELDS and value is not None}
+        if field == "reasoning":
+            return "Scripted reply."
+        return reply.get(field)
+
+    @staticmethod
+    def _render(field: str, value: Any) -> str:
+        if field in TEXT_FIELDS:
+            return str(value)
+        return json.dumps(value)
+
+
+def install_fake_lm(lm: FakeLM, temperature: float):
+    """Serve every provider/model DSPyManager knows from `lm` instead of a real client"""
+    lm.history = BoundedHistory()
+    manager = DSPyManager()
+    for provider, models in manager.lm_configs.items():
+        for model in models:
+            DSPyManager._lm_pool[(provider, model, temperature)] = lm
@@ -0,0 +1,156 @@
+"""
+Chat server for load tests: the real Socket.IO stack and AylaAgentService, with a FakeLM.
+
+    python -m benchmarks.fake_server [--port 5001] [--lm-latency 0.5] [--lm-jitter 0.2] [--memory-mongo]
+
+Wires the same connect/disconnect/chat_message handlers and per-user work queue as app.main,
+but each turn runs AylaAgentService.handle_websocket_request against FakeLM (no API keys or
+network) and MONGODB_URL (default: a local MongoDB), or the in-memory stand-in with
+--memory-mongo. Ozil deliveries are recorded instead of sent.
+
+Every emitted message is tagged with the user it was addressed to (`to`) and the `nonce` of
+the chat_message being answered, so benchmarks.socket_load can detect misrouted and stale replies.
+"""
+import argparse
+import logging
+import os
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import partial
+from typing import Any, Dict, Optional
+
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("MONGODB_DB", "ayla_loadtest")
+os.environ.setdefault("OPENAI_API_KEY", "offline")
+os.environ.setdefault("ANTHROPIC_API_KEY", "offline")
+os.environ.setdefault("OZIL_SERVICE_URL", "http://offline")
+os.environ["LLM_STREAMING"] = "false"
+
+from benchmarks import stand_ins
+
+stand_ins.install()
+
+import uvicorn
+from fastapi import FastAPI
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.mongo_indexes import ensure_indexes
+from app.core.socket_manager import socket_manager
+from app.core.user_work_queue import UserWorkQueue
+from app.main import merge_chat_messages, send_skipped_notice
+from app.schemas.ayla_agent_schemas import AylaAgentRequest
+from app.services.ayla.ayla_agent import AylaAgentService
+from app.services.ayla.ayla_model_manager import CHAT_TEMPERATURE
+from app.services.ayla.ozil_outbox import init_ozil_outbox, stop_ozil_outbox
+from benchmarks.fake_lm import FakeLM, install_fake_lm, load_fixtures
+from benchmarks.memory_mongo import MemoryDatabase
+from benchmarks.pipeline import FakeOzilClient
+from configs.settings import get_settings
+
+turn_nonce: ContextVar[Optional[str]] = ContextVar("turn_nonce", default=None)
+
+
+def tag_replies():
+    """Stamp each emit with its recipient and the nonce of the turn being processed"""
+    send_message = socket_manager.send_message
+
+    async def tagged(user_id: str, message: Dict[str, Any]):
+        await send_message(user_id, {**message, "to": user_id, "nonce": turn_nonce.get()})
+
+    socket_manager.send_message = tagged
+
+
+def create_app(args: argparse.Namespace) -> FastAPI:
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        settings = get_settings()
+        if args.memory_mongo:
+            db = MemoryDatabase(latency=args.mongo_latency)
+        else:
+            db = AsyncIOMotorClient(settings.MONGODB_URL)[settings.MONGODB_DB]
+            await ensure_indexes(db)
+
+        fixtures = load_fixtures()
+        install_fake_lm(FakeLM(fixtures["conversations"], args.lm_latency, args.lm_jitter, args.seed), CHAT_TEMPERATURE)
+        init_ozil_outbox(db, settings)
+        service = AylaAgentService(db, None, None, socket_manager, None, None, settings)
+        service.ozil_client = FakeOzilClient()
+
+        async def process_chat_message(user_id, data):
+            turn_nonce.set(data.get('nonce'))
+            request = AylaAgentRequest(
+                user_id=user_id,
+                message=data['message'],
+                provider=data.get('provider', 'openai'),
+                model=data.get('model', 'gpt-4o-mini'),
+                language=data.get('language', 'en')
+            )
+            await service.handle_websocket_request(None, request)
+
+        async def skipped_chat_message(user_id, data):
+            turn_nonce.set(data.get('nonce'))
+            await send_skipped_notice(user_id, data)
+
+        chat_queue = UserWorkQueue(
+            process_chat_message,
+            max_depth=settings.USER_QUEUE_MAX_DEPTH,
+            policy=settings.USER_QUEUE_POLICY,
+            merge=partial(merge_chat_messages, max_chars=settings.USER_QUEUE_MAX_MERGED_CHARS),
+            on_drop=skipped_chat_message
+        )
+
+        @socket_manager.sio.on('connect')
+        async def handle_connect(sid, environ):
+            query = environ.get('QUERY_STRING', '')
+            params = dict(param.split('=') for param in query.split('&') if param and '=' in param)
+            user_id = params.get('user_id')
+            if user_id and user_id != 'undefined':
+                await socket_manager.connect(sid, user_id)
+
+        @socket_manager.sio.on('disconnect')
+        async def handle_disconnect(sid):
+            await socket_manager.disconnect(sid)
+
+        @socket_manager.sio.on('chat_message')
+        async def handle_message(sid, data):
+            if not chat_queue.submit(data['user_id'], data):
+                turn_nonce.set(data.get('nonce'))
+                await socket_manager.send_message(
+                    data['user_id'],
+                    {
+                        "type": "error",
+                        "content": "Please wait for a reply to your previous messages.",
+                        "sender": "system"
+                    }
+                )
+
+        print(
+            f"Fake LM server: {args.lm_latency * 1000:.0f}ms (+{args.lm_jitter * 1000:.0f}ms jitter) per call, "
+            f"mongo={'in-memory' if args.memory_mongo else settings.MONGODB_URL}"
+        )
+        yield
+        await stop_ozil_outbox()
+        await socket_manager.sio.disconnect()
+
+    tag_replies()
+    app = FastAPI(lifespan=lifespan)
+    app.mount("/", socket_manager.app)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--lm-latency", type=float, default=0.5, help="seconds per fake LM call")
+    parser.add_argument("--lm-jitter", type=float, default=0.2, help="extra random seconds per call, up to")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--memory-mongo", action="store_true", help="use the in-memory Mongo stand-in")
+    parser.add_argument("--mongo-latency", type=float, default=0.0, help="simulated round trip for --memory-mongo")
+    parser.add_argument("--log-level", default="WARNING", type=str.upper, help="per-message INFO logs dominate at high load")
+    args = parser.parse_args()
+
+    for name in ("alyla", "app", "socketio", "engineio"):
+        logging.getLogger(name).setLevel(args.log_level)
+    socket_manager.sio.logger.setLevel(args.log_level)
+    socket_manager.sio.eio.logger.setLevel(args.log_level)
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level=args.log_level.lower())
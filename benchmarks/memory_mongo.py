@@ -0,0 +1,261 @@
+"""
+In-memory stand-in for the Motor database, for offline benchmarks.
+
+Implements the subset of the collection API the chat turn, callback routes, outbox and chat
+history writer use, and counts every call as one round trip, keyed by the `round_trip_stage`
+of the calling task and by "collection.operation". `latency` adds a simulated network round
+trip to each call.
+"""
+import asyncio
+import copy
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+from pymongo.results import InsertManyResult, InsertOneResult, UpdateResult
+
+# Benchmarks set this per task ("turn", "pharmacy_route"...) to attribute round trips
+round_trip_stage: ContextVar[str] = ContextVar("round_trip_stage", default="background")
+
+_MISSING = object()
+
+
+def _get(document: Dict, path: str) -> Any:
+    for part in path.split("."):
+        if not isinstance(document, dict) or part not in document:
+            return _MISSING
+        document = document[part]
+    return document
+
+
+def _set(document: Dict, path: str, value: Any):
+    *parents, last = path.split(".")
+    for part in parents:
+        document = document.setdefault(part, {})
+    document[last] = value
+
+
+def _unset(document: Dict, path: str):
+    *parents, last = path.split(".")
+    for part in parents:
+        document = document.get(part)
+        if not isinstance(document, dict):
+            return
+    document.pop(last, None)
+
+
+def _compare(op: str, value: Any, arg: Any) -> bool:
+    if op == "$exists":
+        return (value is not _MISSING) == bool(arg)
+    if op in ("$eq", "$ne", "$in", "$nin"):
+        value = None if value is _MISSING else value
+        if op == "$eq":
+            return value == arg
+        if op == "$ne":
+            return value != arg
+        if op == "$in":
+            return value in arg
+        return value not in arg
+    if value is _MISSING or value is None:
+        return False
+    if op == "$lt":
+        return value < arg
+    if op == "$lte":
+        return value <= arg
+    if op == "$gt":
+        return value > arg
+    if op == "$gte":
+        return value >= arg
+    raise NotImplementedError(f"Unsupported query operator: {op}")
+
+
+def matches(document: Dict, query: Optional[Dict]) -> bool:
+    for path, condition in (query or {}).items():
+        value = _get(document, path)
+        if isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition):
+            if not all(_compare(op, value, arg) for op, arg in condition.items()):
+                return False
+        elif not _compare("$eq", value, condition):
+            return False
+    return True
+
+
+def apply_update(document: Dict, update: Dict, inserting: bool = False):
+    for op, fields in update.items():
+        for path, value in fields.items():
+            if op == "$set" or (op == "$setOnInsert" and inserting):
+                _set(document, path, copy.deepcopy(value))
+            elif op == "$setOnInsert":
+                continue
+            elif op == "$unset":
+                _unset(document, path)
+            elif op == "$inc":
+                current = _get(document, path)
+                _set(document, path, (0 if current is _MISSING else current) + value)
+            elif op == "$push":
+                current = _get(document, path)
+                items = [] if current is _MISSING else list(current)
+                if isinstance(value, dict) and "$each" in value:
+                    items.extend(copy.deepcopy(value["$each"]))
+                    if "$slice" in value:
+                        limit = value["$slice"]
+                        items = items[limit:] if limit < 0 else items[:limit]
+                else:
+                    items.append(copy.deepcopy(value))
+                _set(document, path, items)
+            else:
+                raise NotImplementedError(f"Unsupported update operator: {op}")
+
+
+def _sorted(documents: List[Dict], sort) -> List[Dict]:
+    if not sort:
+        return documents
+    if isinstance(sort, str):
+        sort = [(sort, 1)]
+    for path, direction in reversed(sort):
+        def key(document, path=path):
+            value = _get(document, path)
+            present = value is not _MISSING and value is not None
+            return (present, value if present else 0)
+        documents = sorted(documents, key=key, reverse=direction < 0)
+    return documents
+
+
+def project(document: Dict, projection: Optional[Dict]) -> Dict:
+    """Inclusion projections of top-level fields; `_id` is kept unless excluded"""
+    if not projection:
+        return copy.deepcopy(document)
+    keep = {key for key, value in projection.items() if value}
+    if projection.get("_id", 1):
+        keep.add("_id")
+    return {key: copy.deepcopy(value) for key, value in document.items() if key in keep}
+
+
+class MemoryCursor:
+    def __init__(self, collection: "MemoryCollection", query: Optional[Dict]):
+        self.collection = collection
+        self.query = query
+        self._sort = None
+        self._limit = 0
+
+    def sort(self, key, direction: int = 1) -> "MemoryCursor":
+        self._sort = key if isinstance(key, list) else [(key, direction)]
+        return self
+
+    def limit(self, limit: int) -> "MemoryCursor":
+        self._limit = limit
+        return self
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict]:
+        await self.collection._round_trip("find")
+        documents = _sorted(self.collection._find(self.query), self._sort)
+        limit = min(filter(None, (self._limit, length)), default=None)
+        return [copy.deepcopy(document) for document in documents[:limit]]
+
+
+class MemoryCollection:
+    def __init__(self, database: "MemoryDatabase", name: str):
+        self.database = database
+        self.name = name
+        self.documents: Dict[Any, Dict] = {}
+
+    async def _round_trip(self, operation: str):
+        self.database.round_trips[(round_trip_stage.get(), f"{self.name}.{operation}")] += 1
+        if self.database.latency:
+            await asyncio.sleep(self.database.latency)
+
+    def _find(self, query: Optional[Dict]) -> List[Dict]:
+        return [document for document in self.documents.values() if matches(document, query)]
+
+    def _insert(self, document: Dict) -> Any:
+        document.setdefault("_id", ObjectId())
+        self.documents[document["_id"]] = copy.deepcopy(document)
+        return document["_id"]
+
+    def _upsert(self, query: Dict, update: Dict) -> Dict:
+        document = {
+            path: value for path, value in query.items()
+            if not (isinstance(value, dict) and any(key.startswith("$") for key in value))
+        }
+        apply_update(document, update, inserting=True)
+        self._insert(document)
+        return self.documents[document["_id"]]
+
+    async def find_one(self, query: Optional[Dict] = None, sort=None, projection: Optional[Dict] = None, **kwargs) -> Optional[Dict]:
+        await self._round_trip("find_one")
+        documents = _sorted(self._find(query), sort)
+        return project(documents[0], projection) if documents else None
+
+    def find(self, query: Optional[Dict] = None, **kwargs) -> MemoryCursor:
+        return MemoryCursor(self, query)
+
+    async def insert_one(self, document: Dict, **kwargs) -> InsertOneResult:
+        await self._round_trip("insert_one")
+        return InsertOneResult(self._insert(document), True)
+
+    async def insert_many(self, documents: List[Dict], ordered: bool = True, **kwargs) -> InsertManyResult:
+        await self._round_trip("insert_many")
+        return InsertManyResult([self._insert(document) for document in documents], True)
+
+    async def update_one(self, query: Dict, update: Dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        await self._round_trip("update_one")
+        documents = self._find(query)
+        if documents:
+            apply_update(documents[0], update)
+            return UpdateResult({"n": 1, "nModified": 1, "updatedExisting": True}, True)
+        if upsert:
+            upserted = self._upsert(query, update)
+            return UpdateResult({"n": 1, "nModified": 0, "upserted": upserted["_id"]}, True)
+        return UpdateResult({"n": 0, "nModified": 0}, True)
+
+    async def find_one_and_update(
+        self,
+        query: Dict,
+        update: Dict,
+        sort=None,
+        upsert: bool = False,
+        return_document: bool = ReturnDocument.BEFORE,
+        projection: Optional[Dict] = None,
+        **kwargs
+    ) -> Optional[Dict]:
+        await self._round_trip("find_one_and_update")
+        documents = _sorted(self._find(query), sort)
+        if not documents:
+            if not upsert:
+                return None
+            upserted = self._upsert(query, update)
+            return project(upserted, projection) if return_document == ReturnDocument.AFTER else None
+        document = documents[0]
+        before = project(document, projection)
+        apply_update(document, update)
+        return project(document, projection) if return_document == ReturnDocument.AFTER else before
+
+    async def create_indexes(self, indexes: List[Any], **kwargs) -> List[str]:
+        await self._round_trip("create_indexes")
+        return [str(index) for index in indexes]
+
+
+class MemoryDatabase:
+    """`db.conversations` / `db["conversation_messages"]` backed by dicts"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.round_trips: Counter = Counter()
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(self, name)
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def round_trips_by_stage(self) -> Dict[str, Counter]:
+        stages: Dict[str, Counter] = {}
+        for (stage, operation), count in self.round_trips.items():
+            stages.setdefault(stage, Counter())[operation] += count
+        return stages
@@ -0,0 +1,272 @@
+"""
+Offline end-to-end benchmark of the chat turn and the pharmacy/order callbacks.
+
+    python -m benchmarks.pipeline [--users 1 10 50] [--lm-latency 0.5] [--lm-jitter 0.2] [--mongo-latency 0.002]
+
+Drives AylaAgentService.handle_websocket_request and the callback routes with the recorded
+conversations in benchmarks/fixtures, a FakeLM and an in-memory Mongo stand-in, so it needs no
+network, API keys or database. At each concurrency level, every user runs one fixture
+conversation turn by turn and then receives a pharmacy and an order callback. Reports per-stage
+latency percentiles, Mongo round trips per request and turn throughput.
+
+Settings are read from the environment as usual (e.g. SESSION_CACHE_ENABLED=true to compare),
+except LLM_STREAMING, which is forced off because streaming calls LiteLLM directly.
+"""
+import argparse
+import asyncio
+import os
+import time
+from collections import defaultdict
+from functools import wraps
+from typing import Callable, Dict, List
+
+os.environ.setdefault("MONGODB_URL", "mongodb://offline")
+os.environ.setdefault("MONGODB_DB", "ayla_benchmark")
+os.environ.setdefault("OPENAI_API_KEY", "offline")
+os.environ.setdefault("ANTHROPIC_API_KEY", "offline")
+os.environ.setdefault("GOOGLE_API_KEY", "offline")
+os.environ.setdefault("OZIL_SERVICE_URL", "http://offline")
+os.environ["LLM_STREAMING"] = "false"
+
+from benchmarks import stand_ins
+
+stand_ins.install()
+
+from fastapi import HTTPException
+from app.api import ayla_agent_route
+from app.core.chat_history_writer import ChatHistoryWriter
+from app.core.metrics import Histogram
+from app.schemas.ayla_agent_schemas import AylaAgentRequest, OrderResponse, PharmacyResponse
+from app.services.ayla.ayla_agent import AylaAgentService
+from app.services.ayla.ayla_model_manager import CHAT_TEMPERATURE
+from benchmarks.fake_lm import FIXTURES, FakeLM, install_fake_lm, load_fixtures
+from benchmarks.memory_mongo import MemoryDatabase, round_trip_stage
+from configs.settings import get_settings
+
+# Keep every sample so percentiles are exact
+SAMPLES = 1_000_000
+ERROR_REPLIES = ("An error occurred", "We're handling a lot of requests")
+PHASES = ("turn", "pharmacy_route", "order_route")
+
+
+class FakeSocketManager:
+    """Collects replies per user instead of emitting them"""
+
+    def __init__(self):
+        self.replies: Dict[str, List[Dict]] = defaultdict(list)
+
+    async def send_message(self, user_id: str = None, message: Dict = None, conversation_id: str = None):
+        self.replies[user_id or conversation_id].append(message)
+
+
+class FakeOzilClient:
+    def __init__(self):
+        self.sent: List[Dict] = []
+
+    async def send_message(self, ozil_message: Dict):
+        self.sent.append(ozil_message)
+
+
+class Stages:
+    """Latency per (phase, stage); the phase is the calling task's round_trip_stage"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.histograms: Dict[tuple, Histogram] = defaultdict(lambda: Histogram(window=SAMPLES))
+
+    def observe(self, stage: str, seconds: float):
+        self.histograms[(round_trip_stage.get(), stage)].observe(seconds)
+
+    def wrap(self, stage: str, func: Callable) -> Callable:
+        @wraps(func)
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                self.observe(stage, time.perf_counter() - started)
+        return timed
+
+    def wrap_sync(self, stage: str, func: Callable) -> Callable:
+        @wraps(func)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.observe(stage, time.perf_counter() - started)
+        return timed
+
+
+class Pipeline:
+    def __init__(self, lm: FakeLM, mongo_latency: float, provider: str, model: str):
+        self.lm = lm
+        self.provider = provider
+        self.model = model
+        self.db = MemoryDatabase(latency=mongo_latency)
+        self.sockets = FakeSocketManager()
+        self.ozil = FakeOzilClient()
+        self.stages = Stages()
+        self.levels = 0
+        self.chat_history = ChatHistoryWriter(self.db)
+        ayla_agent_route.get_socket_manager = lambda: self.sockets
+
+        self.service = AylaAgentService(self.db, None, None, self.sockets, None, None, get_settings())
+        self.service.ozil_client = self.ozil
+        service, stages = self.service, self.stages
+        service.handle_websocket_request = stages.wrap("total", service.handle_websocket_request)
+        service.get_active_conversation = stages.wrap("conversation_read", service.get_active_conversation)
+        service.fast_path.reply = stages.wrap_sync("fast_path", service.fast_path.reply)
+        service.model_manager.get_model_response = stages.wrap("llm", service.model_manager.get_model_response)
+        service.message_store.append = stages.wrap("persist", service.message_store.append)
+
+    def start(self):
+        # Started outside any user task so their round trips count as "background"
+        self.chat_history.start()
+        self.service.ozil_outbox.start()
+
+    async def stop(self):
+        await self.chat_history.stop()
+        await self.service.ozil_outbox.stop()
+
+    async def run_user(self, user_id: str, conversation: Dict, callbacks: Dict, think: float) -> Dict[str, int]:
+        counts = {"turns": 0, "errors": 0, "route_errors": 0}
+        round_trip_stage.set("turn")
+        for turn in conversation["turns"]:
+            sent = len(self.sockets.replies[user_id])
+            request = AylaAgentRequest(
+                user_id=user_id, message=turn["message"], provider=self.provider, model=self.model, language="en"
+            )
+            await self.service.handle_websocket_request(f"sid-{user_id}", request)
+            replies = self.sockets.replies[user_id][sent:]
+            counts["turns"] += 1
+            if not replies or any(reply["content"].startswith(ERROR_REPLIES) for reply in replies):
+                counts["errors"] += 1
+            if think:
+                await asyncio.sleep(think)
+
+        # As from Diana, the payloads' `user_id` field carries the Ayla conversation id: the routes
+        # save under it, and save_message looks up the conversation's owner to drop their session
+        conversation_id = str(max(
+            (doc for doc in self.db.conversations.documents.values() if doc["user_id"] == user_id),
+            key=lambda doc: doc["created_at"]
+        )["_id"])
+        routes = [
+            ("pharmacy_route", ayla_agent_route.handle_pharmacy_response, PharmacyResponse(
+                user_id=conversation_id, conversation_id=f"diana-{user_id}", **callbacks["pharmacy_response"]
+            ), {"db": self.db}),
+            ("order_route", ayla_agent_route.handle_order_response, OrderResponse(
+                user_id=conversation_id, **callbacks["order_response"]
+            ), {}),
+        ]
+        for phase, route, payload, extra in routes:
+            round_trip_stage.set(phase)
+            try:
+                await self.stages.wrap("total", route)(
+                    payload, ayla_service=self.service, chat_history=self.chat_history, **extra
+                )
+            except HTTPException:
+                counts["route_errors"] += 1
+        return counts
+
+    async def run_level(self, users: int, conversations: List[Dict], callbacks: Dict, think: float) -> Dict:
+        self.db.round_trips.clear()
+        self.stages.reset()
+        self.levels += 1
+        prefix = f"bench-{self.levels}-"
+        lm_calls, fallbacks, rfqs = self.lm.calls, self.lm.fallbacks, len(self.ozil.sent)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(
+            self.run_user(f"{prefix}{index}", conversations[index % len(conversations)], callbacks, think)
+            for index in range(users)
+        ))
+        wall = time.perf_counter() - started
+
+        # Let the outbox deliver this level's RFQs and the history writer flush
+        completed = sum(
+            1 for doc in self.db.conversations.documents.values()
+            if doc["user_id"].startswith(prefix) and doc["status"] == "completed"
+        )
+        deadline = time.perf_counter() + 10
+        while len(self.ozil.sent) - rfqs < completed and time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)
+        await self.chat_history.queue.join()
+
+        totals = {key: sum(result[key] for result in results) for key in results[0]}
+        # A turn the fake LM had no recorded reply for measured the wrong conversation
+        fallbacks = self.lm.fallbacks - fallbacks
+        totals["errors"] += fallbacks
+        return {
+            "users": users,
+            "wall": wall,
+            "lm_calls": self.lm.calls - lm_calls,
+            "lm_fallbacks": fallbacks,
+            "rfqs": len(self.ozil.sent) - rfqs,
+            "completed": completed,
+            **totals,
+        }
+
+    def report(self, level: Dict):
+        requests = {"turn": level["turns"], "pharmacy_route": level["users"], "order_route": level["users"]}
+        print(
+            f"\nusers={level['users']} turns={level['turns']} wall={level['wall']:.2f}s "
+            f"throughput={level['turns'] / level['wall']:.1f} turns/s lm_calls={level['lm_calls']} "
+            f"rfqs={level['rfqs']}/{level['completed']} turn_errors={level['errors']} "
+            f"(lm_fallbacks={level['lm_fallbacks']}) route_errors={level['route_errors']}"
+        )
+        print(f"  {'stage':32} {'count':>7} {'p50':>8} {'p95':>8} {'p99':>8}")
+        for phase in PHASES:
+            for (stage_phase, stage), histogram in sorted(self.stages.histograms.items()):
+                if stage_phase != phase:
+                    continue
+                print(
+                    f"  {phase + '.' + stage:32} {histogram.count:7} {histogram.percentile(50) * 1000:6.1f}ms "
+                    f"{histogram.percentile(95) * 1000:6.1f}ms {histogram.percentile(99) * 1000:6.1f}ms"
+                )
+
+        print("  mongo round trips per request:")
+        by_stage = self.db.round_trips_by_stage()
+        for phase in PHASES:
+            operations = by_stage.get(phase, {})
+            total = sum(operations.values()) / max(requests[phase], 1)
+            detail = ", ".join(f"{op}={count / max(requests[phase], 1):.2f}" for op, count in sorted(operations.items()))
+            print(f"    {phase:18} {total:5.2f}  ({detail})")
+        background = by_stage.get("background", {})
+        print(f"    {'background total':18} {sum(background.values()):5d}  ({', '.join(f'{op}={count}' for op, count in sorted(background.items()))})")
+
+
+async def main(args: argparse.Namespace):
+    fixtures = load_fixtures(args.fixtures)
+    lm = FakeLM(fixtures["conversations"], latency=args.lm_latency, jitter=args.lm_jitter, seed=args.seed)
+    install_fake_lm(lm, CHAT_TEMPERATURE)
+    pipeline = Pipeline(lm, args.mongo_latency, args.provider, args.model)
+    pipeline.start()
+    settings = get_settings()
+    print(
+        f"fake LM {args.lm_latency * 1000:.0f}ms (+{args.lm_jitter * 1000:.0f}ms jitter), mongo {args.mongo_latency * 1000:.1f}ms, "
+        f"fast_path={settings.FAST_PATH_ENABLED} session_cache={settings.SESSION_CACHE_ENABLED} "
+        f"response_cache={settings.RESPONSE_CACHE_ENABLED} routing={settings.LLM_ROUTING_ENABLED}"
+    )
+    try:
+        for users in args.users:
+            pipeline.report(await pipeline.run_level(users, fixtures["conversations"], fixtures["callbacks"], args.think))
+    finally:
+        await pipeline.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 50], help="concurrency levels to run")
+    parser.add_argument("--lm-latency", type=float, default=0.5, help="seconds per fake LM call")
+    parser.add_argument("--lm-jitter", type=float, default=0.2, help="extra random seconds per call, up to")
+    parser.add_argument("--mongo-latency", type=float, default=0.002, help="seconds per simulated Mongo round trip")
+    parser.add_argument("--think", type=float, default=0.0, help="seconds each user waits between turns")
+    parser.add_argument("--provider", default="openai")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fixtures", default=str(FIXTURES))
+    args = parser.parse_args()
+    asyncio.run(main(args))
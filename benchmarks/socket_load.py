@@ -0,0 +1,173 @@
+"""
+Socket.IO load generator: many concurrent chat users against a running server.
+
+    python -m benchmarks.fake_server --memory-mongo &
+    python -m benchmarks.socket_load [--url http://127.0.0.1:5001] [--users 10 100 500 1000] [--ramp 5]
+
+At each concurrency level, N python-socketio clients connect with their own `user_id` query
+string and play a fixture conversation (benchmarks/fixtures) one chat_message at a time,
+timing each turn until its text reply arrives. Prints one row per level (throughput and
+latency percentiles, i.e. the throughput/latency curve) and counts:
+
+- dropped: no reply within --timeout
+- misrouted: a reply addressed (`to`) to another user
+- stale: a reply to an earlier turn (`nonce` mismatch), e.g. one that arrived after a timeout
+- rejected: an error reply (busy user queue, overload or a failed turn)
+
+`to` and `nonce` are added by benchmarks.fake_server. Thousands of clients need a matching
+open-files limit (`ulimit -n`) on both ends.
+"""
+import argparse
+import asyncio
+import csv
+import time
+import uuid
+from typing import Dict, List, Optional
+import socketio
+from app.core.metrics import Histogram
+from benchmarks.fake_lm import FIXTURES, load_fixtures
+
+SAMPLES = 1_000_000
+ERROR_REPLIES = ("An error occurred", "We're handling a lot of requests")
+OUTCOMES = ("ok", "dropped", "misrouted", "stale", "rejected", "connect_failed")
+
+
+class Level:
+    """Results for one concurrency level"""
+
+    def __init__(self, users: int):
+        self.users = users
+        self.turn_latency = Histogram(window=SAMPLES)
+        self.connect_latency = Histogram(window=SAMPLES)
+        self.counts = {outcome: 0 for outcome in OUTCOMES}
+        self.wall = 0.0
+
+    def row(self) -> Dict:
+        turns = self.turn_latency.count
+        return {
+            "users": self.users,
+            "turns": turns,
+            "throughput": turns / self.wall if self.wall else 0.0,
+            "p50_ms": self.turn_latency.percentile(50) * 1000,
+            "p95_ms": self.turn_latency.percentile(95) * 1000,
+            "p99_ms": self.turn_latency.percentile(99) * 1000,
+            "connect_p95_ms": self.connect_latency.percentile(95) * 1000,
+            **self.counts,
+        }
+
+
+async def run_user(url: str, user_id: str, turns: List[Dict], args: argparse.Namespace, level: Level):
+    client = socketio.AsyncClient(reconnection=False)
+    replies: asyncio.Queue = asyncio.Queue()
+    client.on("message", replies.put_nowait)
+
+    started = time.perf_counter()
+    try:
+        await client.connect(f"{url}?user_id={user_id}", transports=["websocket"], wait_timeout=args.timeout)
+    except Exception:
+        level.counts["connect_failed"] += 1
+        return
+    level.connect_latency.observe(time.perf_counter() - started)
+
+    try:
+        for turn in turns:
+            nonce = uuid.uuid4().hex
+            started = time.perf_counter()
+            await client.emit("chat_message", {
+                "user_id": user_id,
+                "message": turn["message"],
+                "provider": args.provider,
+                "model": args.model,
+                "language": "en",
+                "nonce": nonce,
+            })
+            outcome = await wait_for_reply(replies, user_id, nonce, started + args.timeout, level)
+            level.counts[outcome] += 1
+            if outcome == "ok":
+                level.turn_latency.observe(time.perf_counter() - started)
+            elif outcome != "rejected":
+                # The conversation is out of step with the script; stop this user
+                break
+            if args.think:
+                await asyncio.sleep(args.think)
+    finally:
+        await client.disconnect()
+
+
+async def wait_for_reply(replies: asyncio.Queue, user_id: str, nonce: str, deadline: float, level: Level) -> str:
+    """Outcome of one turn; misrouted and stale replies are counted and skipped"""
+    while True:
+        try:
+            reply: Optional[Dict] = await asyncio.wait_for(replies.get(), max(deadline - time.perf_counter(), 0))
+        except asyncio.TimeoutError:
+            return "dropped"
+        if reply.get("to") not in (None, user_id):
+            level.counts["misrouted"] += 1
+            continue
+        if "nonce" in reply and reply["nonce"] != nonce:
+            level.counts["stale"] += 1
+            continue
+        if reply.get("type") == "text_delta":
+            continue
+        if reply.get("type") == "error" or str(reply.get("content", "")).startswith(ERROR_REPLIES):
+            return "rejected"
+        return "ok"
+
+
+async def run_level(url: str, users: int, conversations: List[Dict], args: argparse.Namespace, run_id: str) -> Level:
+    level = Level(users)
+
+    async def start_user(index: int):
+        # Spread connects over the ramp so the level measures steady state, not a connect storm
+        await asyncio.sleep(args.ramp * index / users)
+        conversation = conversations[index % len(conversations)]
+        await run_user(url, f"load-{run_id}-{users}-{index}", conversation["turns"], args, level)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(start_user(index) for index in range(users)))
+    level.wall = time.perf_counter() - started
+    return level
+
+
+def print_row(row: Dict):
+    print(
+        f"{row['users']:>6} {row['turns']:>7} {row['throughput']:>9.1f} {row['p50_ms']:>8.0f} {row['p95_ms']:>8.0f} "
+        f"{row['p99_ms']:>8.0f} {row['connect_p95_ms']:>11.0f} {row['dropped']:>8} {row['misrouted']:>10} "
+        f"{row['stale']:>6} {row['rejected']:>9} {row['connect_failed']:>15}"
+    )
+
+
+async def main(args: argparse.Namespace):
+    conversations = load_fixtures(args.fixtures)["conversations"]
+    # Fresh user ids per run, so a persistent database never resumes an old conversation
+    run_id = uuid.uuid4().hex[:8]
+    rows = []
+    print(
+        f"{'users':>6} {'turns':>7} {'turns/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'connect p95':>11} "
+        f"{'dropped':>8} {'misrouted':>10} {'stale':>6} {'rejected':>9} {'connect_failed':>15}"
+    )
+    for users in args.users:
+        row = (await run_level(args.url, users, conversations, args, run_id)).row()
+        print_row(row)
+        rows.append(row)
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5001")
+    parser.add_argument("--users", type=int, nargs="+", default=[10, 100, 500, 1000], help="concurrency levels to run")
+    parser.add_argument("--ramp", type=float, default=5.0, help="seconds over which each level's users connect")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for each reply")
+    parser.add_argument("--think", type=float, default=0.0, help="seconds each user waits between turns")
+    parser.add_argument("--provider", default="openai")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--fixtures", default=str(FIXTURES))
+    parser.add_argument("--csv", help="also write the curve to this CSV file")
+    args = parser.parse_args()
+    asyncio.run(main(args))
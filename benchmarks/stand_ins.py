@@ -0,0 +1,133 @@
+"""
+Stand-ins for app modules that are not part of this tree, so the benchmarks can import
+AylaAgentService and the callback routes.
+
+The agent and routes import request schemas, FastAPI dependency providers, the socket
+manager package and several service clients from modules that live in the deployed app.
+`install()` registers a minimal version of each one in `sys.modules`, only for modules that
+cannot be imported, so a full checkout always uses the real ones. The benchmarks replace the
+clients (socket manager, Ozil client) with their own fakes anyway; the schemas carry exactly
+the fields the agent, the routes and benchmarks/fixtures use.
+"""
+import importlib.util
+import sys
+import types
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel
+
+
+class AylaAgentRequest(BaseModel):
+    user_id: str
+    message: str
+    provider: Optional[str] = "openai"
+    model: Optional[str] = "gpt-4"
+    language: Optional[str] = "en"
+
+
+class Medicine(BaseModel):
+    name: Optional[str] = None
+    price: Optional[float] = None
+    quantity_available: Optional[int] = None
+    price_measurement: Optional[str] = None
+    available: Optional[bool] = None
+
+
+class PharmacyResponse(BaseModel):
+    # The Ayla conversation id, as sent by Diana
+    user_id: str
+    conversation_id: str
+    pharmacy_name: Optional[str] = None
+    pharmacy_phone: Optional[str] = None
+    conversation_summary: Optional[str] = None
+    medicines: List[Medicine] = []
+
+
+class OrderResponse(BaseModel):
+    user_id: str
+    order_status: bool
+    conversation_summary: str
+
+
+class DianaConversationLink(BaseModel):
+    user_id: str
+    ayla_conversation_id: str
+    follow_up_diana_conversation_id: str
+
+
+class _Client:
+    """Accepts any constructor arguments; the benchmarks never call these clients"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+
+class OzilClient(_Client):
+    async def send_message(self, ozil_message: Dict[str, Any]):
+        raise RuntimeError("Ozil is not available offline; install a fake client")
+
+
+def _not_provided(*args, **kwargs):
+    raise RuntimeError("FastAPI dependencies are not available offline; pass them explicitly")
+
+
+def get_socket_manager():
+    raise RuntimeError("No socket manager offline; the benchmark patches get_socket_manager")
+
+
+STAND_INS: Dict[str, Dict[str, Any]] = {
+    "app.schemas.ayla_agent_schemas": {
+        "AylaAgentRequest": AylaAgentRequest,
+        "PharmacyResponse": PharmacyResponse,
+        "OrderResponse": OrderResponse,
+        "DianaConversationLink": DianaConversationLink,
+    },
+    "app.dependencies.depends": {"get_ayla_agent": _not_provided, "get_db": _not_provided},
+    "app.socket_manger.socket_manager": {"SocketManager": _Client},
+    "app.socket_manger.socket_manager_utils": {"get_socket_manager": get_socket_manager},
+    "app.core.ozil_client": {"OzilClient": OzilClient},
+    "app.core.ayla_document_processor": {"AylaDocumentProcessor": _Client},
+    "app.core.ayla_voice_processor": {"AudioProcessor": _Client},
+    "app.core.dima_http_client": {"DimaHttpClient": _Client},
+    "app.core.diana_http_client": {"DianaHttpClient": _Client},
+}
+
+
+def _importable(name: str) -> bool:
+    if name in sys.modules:
+        return True
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ImportError:
+        return False
+
+
+def _register(name: str, attributes: Dict[str, Any], package: bool = False) -> types.ModuleType:
+    module = sys.modules.get(name)
+    if module is None:
+        module = types.ModuleType(name, "Offline stand-in (benchmarks/stand_ins.py)")
+        if package:
+            module.__path__ = []
+        sys.modules[name] = module
+        parent, _, child = name.rpartition(".")
+        if parent:
+            setattr(sys.modules[parent], child, module)
+    for key, value in attributes.items():
+        setattr(module, key, value)
+    return module
+
+
+def install():
+    """Register a stand-in for every module in STAND_INS that cannot be imported; idempotent"""
+    for name, attributes in STAND_INS.items():
+        if _importable(name):
+            continue
+        parts = name.split(".")
+        for depth in range(1, len(parts)):
+            package = ".".join(parts[:depth])
+            if package in sys.modules:
+                continue
+            if _importable(package):
+                importlib.import_module(package)
+            else:
+                _register(package, {}, package=True)
+        _register(name, attributes)
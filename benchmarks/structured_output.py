@@ -0,0 +1,108 @@
+"""
+Compare the text adapter with JSON-schema structured output for ChatResponse.
+
+    python -m benchmarks.structured_output [--provider openai] [--model gpt-4o-mini] [--repeats 5] [--reasoning]
+
+Calls the real provider (LM cache disabled) for every fixture turn in both modes and reports
+latency percentiles, mean prompt/output tokens and the raw parse-failure rate. Parsing is
+done here without DSPy's adapter fallback, so failures that would otherwise cost a silent
+retry are counted.
+"""
+import argparse
+import time
+import dspy
+from app.core.metrics import Histogram
+from app.services.ayla.ayla_model_manager import AylaModelManager, CHAT_SIGNATURE, CHAT_TEMPERATURE
+from app.services.ayla.llm_usage import extract_usage
+from app.services.ayla.structured_output import response_format, structured_predict, with_reasoning
+
+EMPTY_CONTEXT = {"status": "product"}
+
+# (confirmation_context, history, message): one turn per step of the flow
+TURNS = [
+    (EMPTY_CONTEXT, [], "Hi, I need to source some laptops for our IT department."),
+    (
+        {"status": "quantity", "product": "Dell Latitude laptops"},
+        [
+            {"role": "user", "content": "We need Dell Latitude laptops."},
+            {"role": "assistant", "content": "Could you please specify the quantity required?"},
+        ],
+        "We need 25 laptops.",
+    ),
+    (
+        {"status": "supplier_type", "product": "A4 white printer paper, 80gsm", "quantity": 200},
+        [
+            {"role": "user", "content": "200 reams"},
+            {"role": "assistant", "content": "Would you like quotes from private suppliers, public suppliers, or both?"},
+        ],
+        "Public suppliers, and I need it delivered within 2 weeks",
+    ),
+    (
+        {"status": "supplier_type", "product": "Cat6 Ethernet cables, 5 meters each", "quantity": 100, "supplier_type": "private"},
+        [
+            {"role": "user", "content": "Private suppliers"},
+            {"role": "assistant", "content": "Would you like to provide any optional details?"},
+        ],
+        "No, that's all I need",
+    ),
+]
+
+
+def run_text(lm: dspy.LM, inputs: dict, signature):
+    adapter = dspy.ChatAdapter()
+    completion = lm(messages=adapter.format(signature, demos=[], inputs=inputs))[0]
+    adapter.parse(signature, completion)
+
+
+def run_json(lm: dspy.LM, inputs: dict, signature):
+    structured_predict(lm, signature, inputs, response_format(signature))
+
+
+def measure(name: str, run, lm: dspy.LM, manager: AylaModelManager, signature, repeats: int):
+    latency = Histogram()
+    prompt_tokens = output_tokens = failures = 0
+    for _ in range(repeats):
+        for context, history, message in TURNS:
+            inputs = {"messages": history, "context": manager.get_context_prompt(context), "message": message}
+            calls_before = len(lm.history)
+            started = time.perf_counter()
+            try:
+                run(lm, inputs, signature)
+            except Exception:
+                failures += 1
+            latency.observe(time.perf_counter() - started)
+            if len(lm.history) > calls_before:
+                usage = extract_usage(lm.history[-1]["response"])
+                prompt_tokens += usage["prompt_tokens"]
+                output_tokens += usage["completion_tokens"]
+
+    calls = latency.count
+    print(
+        f"{name:14} calls={calls:<4} parse_failures={failures / calls:6.1%} "
+        f"p50={latency.percentile(50):6.2f}s p95={latency.percentile(95):6.2f}s "
+        f"prompt_tokens={prompt_tokens / calls:7.0f} output_tokens={output_tokens / calls:6.0f}"
+    )
+
+
+def main(provider: str, model: str, repeats: int, reasoning: bool):
+    manager = AylaModelManager()
+    lm = dspy.LM(
+        manager.dspy_manager.lm_configs[provider][model],
+        api_key=manager.dspy_manager.api_keys[provider],
+        temperature=CHAT_TEMPERATURE,
+        cache=False
+    )
+    signature = with_reasoning(CHAT_SIGNATURE) if reasoning else CHAT_SIGNATURE
+    print(f"{provider}/{model}, {len(TURNS)} turns x {repeats}, reasoning={'on' if reasoning else 'off'}")
+    measure("text adapter", run_text, lm, manager, signature, repeats)
+    measure("json schema", run_json, lm, manager, signature, repeats)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--provider", default="openai")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--reasoning", action="store_true", help="add a reasoning output field in both modes")
+    args = parser.parse_args()
+    main(args.provider, args.model, args.repeats, args.reasoning)
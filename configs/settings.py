@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
     """Application settings"""
@@ -7,7 +8,105 @@ class Settings(BaseSettings):
     MONGODB_DB: str
     OPENAI_API_KEY: str
     ANTHROPIC_API_KEY: str
+    GOOGLE_API_KEY: Optional[str] = None
     OZIL_SERVICE_URL: str
+    DIANA_SERVICE_URL: Optional[str] = None
+    DIMA_SERVICE_URL: Optional[str] = None
+
+    LLM_EXECUTOR_MAX_WORKERS: int = 16
+    LLM_EXECUTOR_MAX_QUEUE: int = 64
+    LLM_CALL_TIMEOUT: float = 60.0
+    # Admission control per provider/model. LLM_ADMISSION_LIMITS overrides the defaults by
+    # "provider" or "provider/model", e.g. {"openai/gpt-4o": {"concurrency": 32, "rate": 8}}
+    LLM_ADMISSION_CONCURRENCY: int = 16
+    LLM_ADMISSION_RATE: float = 0.0
+    LLM_ADMISSION_BURST: float = 10.0
+    LLM_ADMISSION_MAX_WAITERS: int = 100
+    LLM_ADMISSION_TIMEOUT: float = 10.0
+    LLM_ADMISSION_LIMITS: Dict[str, Dict[str, float]] = {}
+
+    # Hedged requests (non-streaming turns only): when the primary route is slower than its
+    # observed LLM_HEDGE_PERCENTILE latency, the same call is sent to the secondary route from
+    # LLM_HEDGE_ROUTES, e.g. {"openai/gpt-4o-mini": "anthropic/claude-3-haiku"}
+    LLM_HEDGING_ENABLED: bool = False
+    LLM_HEDGE_ROUTES: Dict[str, str] = {}
+    LLM_HEDGE_PERCENTILE: float = 95.0
+    LLM_HEDGE_MIN_DELAY: float = 1.0
+    LLM_HEDGE_MIN_SAMPLES: int = 50
+
+    # Circuit breaker per provider/model, and the ordered "provider/model" routes to fail over to
+    LLM_BREAKER_WINDOW: int = 20
+    LLM_BREAKER_MIN_CALLS: int = 5
+    LLM_BREAKER_ERROR_RATE: float = 0.5
+    LLM_BREAKER_SLOW_RATE: float = 0.5
+    LLM_BREAKER_SLOW_CALL_SECONDS: float = 20.0
+    LLM_BREAKER_COOLDOWN: float = 30.0
+    LLM_BREAKER_HALF_OPEN_PROBES: int = 1
+    LLM_FAILOVER_ROUTES: List[str] = []
+
+    # "text" (DSPy ChatAdapter field markers) or "json" (provider-native JSON-schema output)
+    LLM_OUTPUT_MODE: str = "text"
+    # Ask for step-by-step reasoning before the answer (ChainOfThought); costs output tokens
+    LLM_REASONING: bool = False
+
+    # Have the model return only the fields that changed this turn (merged server-side)
+    LLM_DELTA_MODE: bool = False
+
+    # Per-turn model routing: LLM_ROUTES names "provider/model" targets, LLM_ROUTING_TABLE maps
+    # a turn kind (status, "confirmation", "complex" or "default") to a route name. When enabled,
+    # the route overrides the provider/model a client sends (an anthropic request may be served
+    # by openai)
+    LLM_ROUTING_ENABLED: bool = False
+    LLM_ROUTES: Dict[str, str] = {"fast": "openai/gpt-4o-mini", "strong": "openai/gpt-4o"}
+    LLM_ROUTING_TABLE: Dict[str, str] = {
+        "product": "strong",
+        "quantity": "fast",
+        "supplier_type": "fast",
+        "confirmation": "strong",
+        "complex": "strong",
+        "default": "fast",
+    }
+    LLM_ROUTER_COMPLEX_WORDS: int = 25
+
+    LLM_STREAMING: bool = False
+    # Answer bare slot-filling replies ("25", "both", "no that's all") without calling the LLM;
+    # opt-in, since the deterministic rules only cover plain English answers
+    FAST_PATH_ENABLED: bool = False
+    LLM_HISTORY_TOKEN_BUDGET: int = 4000
+    LLM_HISTORY_MAX_MESSAGES: int = 20
+    CONVERSATION_WINDOW_MESSAGES: int = 20
+
+    REDIS_URL: Optional[str] = None
+    RESPONSE_CACHE_ENABLED: bool = False
+    RESPONSE_CACHE_USE_REDIS: bool = False
+    RESPONSE_CACHE_MAXSIZE: int = 1024
+    RESPONSE_CACHE_TTL: int = 3600
+    SESSION_CACHE_ENABLED: bool = False
+    SESSION_CACHE_USE_REDIS: bool = False
+    SESSION_CACHE_MAXSIZE: int = 10000
+    SESSION_CACHE_TTL: int = 900
+
+    HTTP_POOL_LIMIT: int = 100
+    HTTP_KEEPALIVE_TIMEOUT: float = 30.0
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_READ_TIMEOUT: float = 30.0
+    HTTP_RETRIES: int = 3
+    HTTP_BACKOFF_BASE: float = 0.2
+    HTTP_BACKOFF_MAX: float = 5.0
+
+    # Redis URL for the Socket.IO message queue; required to run more than one worker
+    SOCKETIO_MESSAGE_QUEUE: Optional[str] = None
+
+    # Per-user chat queue: waiting turns allowed behind the running one, and what to do
+    # beyond that ("merge", "reject" or "drop_oldest")
+    USER_QUEUE_MAX_DEPTH: int = 4
+    USER_QUEUE_POLICY: str = "merge"
+    # The merge policy refuses a message once the merged turn would be longer than this
+    USER_QUEUE_MAX_MERGED_CHARS: int = 2000
+
+    OZIL_OUTBOX_WORKERS: int = 4
+    OZIL_OUTBOX_BATCH_SIZE: int = 10
+    OZIL_OUTBOX_MAX_ATTEMPTS: int = 8
 
     class Config:
         case_sensitive = True
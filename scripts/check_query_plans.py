@@ -0,0 +1,36 @@
+"""
+Explain every hot MongoDB query and fail if any of them is a collection scan.
+
+    python -m scripts.check_query_plans [--ensure-indexes]
+"""
+import argparse
+import asyncio
+import sys
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.mongo_indexes import ensure_indexes, explain_hot_queries
+from configs.settings import get_settings
+
+
+async def main(create: bool) -> int:
+    settings = get_settings()
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.MONGODB_DB]
+    try:
+        if create:
+            await ensure_indexes(db)
+        results = await explain_hot_queries(db)
+    finally:
+        client.close()
+
+    for result in results:
+        verdict = "COLLSCAN" if result["collscan"] else "ok"
+        print(f"{verdict:8} {result['name']:28} {result['collection']:28} {' <- '.join(result['stages'])}")
+
+    return 1 if any(result["collscan"] for result in results) else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ensure-indexes", action="store_true", help="create missing indexes before explaining")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.ensure_indexes)))
@@ -0,0 +1,87 @@
+"""
+Move embedded `conversations.messages` arrays into the `conversation_messages` collection.
+
+    python -m scripts.migrate_conversation_messages [--dry-run] [--batch-size 200]
+
+Each conversation keeps the newest CONVERSATION_WINDOW_MESSAGES messages in `recent_messages`
+and gets `message_count`; the embedded array is removed. Safe to re-run: messages already
+copied are skipped by the unique (conversation_id, seq) index. Run it before starting a
+version that writes through MessageStore, while no chat traffic is being served.
+"""
+import argparse
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.core.message_store import MESSAGES_COLLECTION
+from app.core.mongo_indexes import ensure_indexes
+from configs.settings import get_settings
+
+DUPLICATE_KEY = 11000
+
+
+async def migrate(db, window: int, batch_size: int, dry_run: bool) -> int:
+    cursor = db.conversations.find(
+        {"messages": {"$exists": True}},
+        {"messages": 1, "created_at": 1}
+    ).batch_size(batch_size)
+
+    migrated = 0
+    updates = []
+    async for conversation in cursor:
+        messages = conversation.get("messages") or []
+        log = [
+            {
+                **message,
+                "conversation_id": conversation["_id"],
+                "seq": seq,
+                "created_at": message.get("timestamp") or conversation.get("created_at"),
+            }
+            for seq, message in enumerate(messages, start=1)
+        ]
+        if log and not dry_run:
+            try:
+                await db[MESSAGES_COLLECTION].insert_many(log, ordered=False)
+            except BulkWriteError as e:
+                if any(error["code"] != DUPLICATE_KEY for error in e.details["writeErrors"]):
+                    raise
+
+        updates.append(UpdateOne(
+            {"_id": conversation["_id"]},
+            {
+                "$set": {"recent_messages": messages[-window:], "message_count": len(messages)},
+                "$unset": {"messages": ""}
+            }
+        ))
+        migrated += 1
+
+        if len(updates) >= batch_size:
+            if not dry_run:
+                await db.conversations.bulk_write(updates, ordered=False)
+            updates = []
+            print(f"Migrated {migrated} conversations")
+
+    if updates and not dry_run:
+        await db.conversations.bulk_write(updates, ordered=False)
+    return migrated
+
+
+async def main(batch_size: int, dry_run: bool):
+    settings = get_settings()
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.MONGODB_DB]
+    try:
+        if not dry_run:
+            await ensure_indexes(db)
+        migrated = await migrate(db, settings.CONVERSATION_WINDOW_MESSAGES, batch_size, dry_run)
+    finally:
+        client.close()
+    print(f"{'Would migrate' if dry_run else 'Migrated'} {migrated} conversations")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="report what would be migrated without writing")
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size, args.dry_run))
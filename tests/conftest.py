@@ -0,0 +1,11 @@
+import os
+
+# Settings requires these; the unit tests never reach the services behind them
+for name, value in {
+    "MONGODB_URL": "mongodb://localhost:27017",
+    "MONGODB_DB": "ayla_test",
+    "OPENAI_API_KEY": "test",
+    "ANTHROPIC_API_KEY": "test",
+    "OZIL_SERVICE_URL": "http://localhost:9999",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,94 @@
+import asyncio
+import pytest
+from app.services.ayla.admission import AdmissionController, AdmissionRejected, Priority
+
+
+def test_waiters_are_served_by_priority_then_arrival():
+    async def run():
+        controller = AdmissionController(concurrency=1)
+        order = []
+        release = asyncio.Event()
+
+        async def call(name, priority):
+            async with controller.admit("openai", "gpt-4o-mini", priority):
+                order.append(name)
+                if name == "first":
+                    await release.wait()
+
+        first = asyncio.create_task(call("first", Priority.INTERACTIVE))
+        await asyncio.sleep(0)
+        waiting = [
+            asyncio.create_task(call(name, priority)) for name, priority in [
+                ("background", Priority.BACKGROUND),
+                ("welcome", Priority.WELCOME),
+                ("interactive-1", Priority.INTERACTIVE),
+                ("interactive-2", Priority.INTERACTIVE),
+            ]
+        ]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(first, *waiting)
+        return order
+
+    assert asyncio.run(run()) == ["first", "interactive-1", "interactive-2", "welcome", "background"]
+
+
+def test_full_queue_sheds_lower_priority_waiters_and_rejects_the_rest():
+    async def run():
+        controller = AdmissionController(concurrency=1, max_waiters=1)
+        release = asyncio.Event()
+
+        async def call(priority):
+            async with controller.admit("openai", "gpt-4o-mini", priority):
+                await release.wait()
+
+        running = asyncio.create_task(call(Priority.INTERACTIVE))
+        await asyncio.sleep(0)
+        background = asyncio.create_task(call(Priority.BACKGROUND))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(call(Priority.INTERACTIVE))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as queue_full:
+            await call(Priority.WELCOME)
+        release.set()
+        results = await asyncio.gather(running, background, interactive, return_exceptions=True)
+        return queue_full.value.reason, results
+
+    reason, (running, background, interactive) = asyncio.run(run())
+    assert reason == "queue_full"
+    assert running is None and interactive is None
+    assert isinstance(background, AdmissionRejected) and background.reason == "shed"
+
+
+def test_waiting_past_the_timeout_is_rejected_and_frees_nothing():
+    async def run():
+        controller = AdmissionController(concurrency=1, timeout=0.01)
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.admit("openai", "gpt-4o-mini"):
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as timeout:
+            async with controller.admit("openai", "gpt-4o-mini"):
+                pass
+        limiter = controller.limiter("openai", "gpt-4o-mini")
+        in_flight = limiter.in_flight
+        release.set()
+        await holder
+        return timeout.value.reason, in_flight, limiter.in_flight
+
+    assert asyncio.run(run()) == ("timeout", 1, 0)
+
+
+def test_limits_are_looked_up_by_route_then_provider():
+    controller = AdmissionController(
+        concurrency=16,
+        limits={"openai": {"concurrency": 8}, "openai/gpt-4o": {"concurrency": 2, "rate": 5}}
+    )
+    assert controller.limiter("openai", "gpt-4o").concurrency == 2
+    assert controller.limiter("openai", "gpt-4o").bucket.rate == 5
+    assert controller.limiter("openai", "gpt-4o-mini").concurrency == 8
+    assert controller.limiter("anthropic", "claude-3-haiku").concurrency == 16
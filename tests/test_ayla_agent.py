@@ -0,0 +1,125 @@
+import asyncio
+import dspy
+import pytest
+from benchmarks import stand_ins
+
+stand_ins.install()
+
+from app.core.message_store import MESSAGES_COLLECTION
+from app.core.session_cache import SessionCache
+from app.schemas.ayla_agent_schemas import AylaAgentRequest
+from app.services.ayla import ozil_outbox
+from app.services.ayla.ayla_agent import AylaAgentService
+from app.services.ayla.model_router import ModelRouter
+from benchmarks.memory_mongo import MemoryDatabase
+from benchmarks.pipeline import FakeSocketManager
+from configs.settings import get_settings
+
+
+def prediction(reply="How many do you need?", status="quantity", to_ozil=False):
+    return dspy.Prediction(
+        ayla_response=reply,
+        status=status,
+        to_ozil=to_ozil,
+        product_name="laptops",
+        product_category="electronics",
+        quantity=None,
+        supplier_type=None,
+        brand=None,
+        model=None,
+        description=None,
+        delivery_location=None,
+        preferred_delivery_timeline=None,
+        supplier_list_name=None
+    )
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(ozil_outbox, "_outbox", None)
+    sockets = FakeSocketManager()
+    service = AylaAgentService(MemoryDatabase(), None, None, sockets, None, None, get_settings())
+    service.session_cache = None
+    service.router = None
+    service.calls = []
+
+    async def get_model_response(**kwargs):
+        service.calls.append(kwargs)
+        return prediction()
+
+    service.model_manager.get_model_response = get_model_response
+    return service
+
+
+def request(message="laptops"):
+    return AylaAgentRequest(user_id="u1", message=message, provider="openai", model="gpt-4o-mini", language="en")
+
+
+def test_a_failed_log_insert_still_sends_the_reply(service):
+    async def failing_insert(documents, **kwargs):
+        raise RuntimeError("log unavailable")
+
+    async def run():
+        service.db[MESSAGES_COLLECTION].insert_many = failing_insert
+        await service.handle_websocket_request(None, request())
+        return await service.db.conversations.find_one({"user_id": "u1"})
+
+    conversation = asyncio.run(run())
+    assert service.socket_manager.replies["u1"] == [
+        {"done": True, "type": "text", "content": "How many do you need?", "sender": "ai"}
+    ]
+    assert [m["content"] for m in conversation["recent_messages"]] == ["laptops", "How many do you need?"]
+    assert conversation["confirmation_context"]["status"] == "quantity"
+    assert conversation["message_count"] == 2
+
+
+def test_the_cached_session_includes_a_callback_saved_during_the_turn(service):
+    service.session_cache = SessionCache()
+
+    async def get_model_response(**kwargs):
+        # A pharmacy callback lands while the model is still answering
+        conversation = await service.db.conversations.find_one({"user_id": "u1"})
+        await service.save_message(str(conversation["_id"]), "Pharmacy One has laptops", "ai", "pharmacy")
+        return prediction()
+
+    async def run():
+        await service.send_welcome_message("u1")
+        service.model_manager.get_model_response = get_model_response
+        await service.handle_websocket_request(None, request())
+        return await service.session_cache.get("u1")
+
+    cached = asyncio.run(run())
+    assert [m["content"] for m in cached["recent_messages"]] == [
+        "Pharmacy One has laptops", "laptops", "How many do you need?"
+    ]
+    assert cached["message_count"] == 3
+    assert cached["confirmation_context"]["status"] == "quantity"
+
+
+def test_the_routed_model_sizes_the_history_and_is_reported_to_ozil(service, monkeypatch):
+    windowed = []
+    format_history = service._format_conversation_history
+
+    def format_conversation_history(conversation, model="gpt-4o-mini"):
+        windowed.append(model)
+        return format_history(conversation, model=model)
+
+    async def get_model_response(**kwargs):
+        service.calls.append(kwargs)
+        return prediction(reply="Sending your request", status="complete", to_ozil=True)
+
+    service.router = ModelRouter({"strong": "openai/gpt-4o"}, {"default": "strong"})
+    service._format_conversation_history = format_conversation_history
+    service.model_manager.get_model_response = get_model_response
+
+    async def run():
+        await service.handle_websocket_request(
+            None,
+            AylaAgentRequest(user_id="u1", message="yes", provider="anthropic", model="claude-3-haiku", language="en")
+        )
+        return await service.db[ozil_outbox.OUTBOX_COLLECTION].find_one({})
+
+    entry = asyncio.run(run())
+    assert windowed == ["gpt-4o"]
+    assert (service.calls[0]["provider"], service.calls[0]["model"]) == ("openai", "gpt-4o")
+    assert (entry["message"]["provider"], entry["message"]["model"]) == ("openai", "gpt-4o")
@@ -0,0 +1,119 @@
+import pytest
+from app.services.ayla.circuit_breaker import CLOSED, HALF_OPEN, OPEN, BreakerRegistry, CircuitBreaker, CircuitOpenError
+from app.services.ayla.dspy_config import DSPyManager
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def breaker(clock, **kwargs) -> CircuitBreaker:
+    config = {"window": 10, "min_calls": 4, "error_threshold": 0.5, "cooldown": 30.0, "half_open_probes": 1}
+    return CircuitBreaker("openai/gpt-4o-mini", clock=clock, **{**config, **kwargs})
+
+
+def trip(breaker: CircuitBreaker):
+    for _ in range(breaker.min_calls):
+        breaker.record(False, 0.1)
+
+
+def test_closed_open_half_open_closed(clock):
+    b = breaker(clock)
+    for success in (True, False, True):
+        b.record(success, 0.1)
+    assert b.state == CLOSED
+
+    b.record(False, 0.1)  # 2 errors in 4 calls
+    assert b.state == OPEN
+    assert not b.allow()
+
+    clock.advance(29)
+    assert b.state == OPEN
+    clock.advance(1)
+    assert b.state == HALF_OPEN
+    assert b.allow()
+    assert not b.allow()  # one probe at a time
+
+    b.record(True, 0.1, b.generation)
+    assert b.state == CLOSED
+    assert b.snapshot()["calls"] == 0
+
+
+def test_failed_probe_reopens(clock):
+    b = breaker(clock)
+    trip(b)
+    clock.advance(30)
+    assert b.allow()
+    b.record(False, 0.1, b.generation)
+    assert b.state == OPEN
+    clock.advance(29)
+    assert not b.allow()
+
+
+def test_slow_calls_open_the_breaker(clock):
+    b = breaker(clock, slow_call_seconds=5.0, slow_threshold=0.5)
+    for latency in (1.0, 6.0, 1.0, 7.0):
+        b.record(True, latency)
+    assert b.state == OPEN
+
+
+def test_call_started_before_opening_is_not_the_probe(clock):
+    b = breaker(clock)
+    started_in = b.generation
+    trip(b)
+    clock.advance(30)
+    assert b.allow()  # the real probe
+
+    b.record(True, 31.0, started_in)  # the old call finishes now
+    assert b.state == HALF_OPEN
+    b.record(False, 31.0, started_in)
+    assert b.state == HALF_OPEN
+
+    b.record(True, 0.1, b.generation)
+    assert b.state == CLOSED
+
+
+def test_unanswered_probe_expires(clock):
+    b = breaker(clock)
+    trip(b)
+    clock.advance(30)
+    assert b.allow()
+    assert not b.allow()
+    clock.advance(30)
+    assert b.allow()
+
+
+def test_manager_fails_over_and_tracks_with_the_registry_clock(clock):
+    registry = BreakerRegistry(clock=clock, min_calls=2, cooldown=30.0, slow_call_seconds=20.0)
+    manager = DSPyManager(breakers=registry)
+    manager.failover_routes = [("anthropic", "claude-3-haiku")]
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            with manager.track("openai", "gpt-4o-mini"):
+                clock.advance(1)
+                raise RuntimeError("provider error")
+    assert manager.breaker_states()["openai/gpt-4o-mini"]["state"] == OPEN
+    assert manager.select_route("openai", "gpt-4o-mini") == ("anthropic", "claude-3-haiku")
+
+    trip(registry.get("anthropic", "claude-3-haiku"))
+    with pytest.raises(CircuitOpenError):
+        manager.select_route("openai", "gpt-4o-mini")
+
+    clock.advance(30)
+    assert manager.select_route("openai", "gpt-4o-mini") == ("openai", "gpt-4o-mini")
+    with manager.track("openai", "gpt-4o-mini"):
+        clock.advance(25)  # a slow probe
+    assert registry.get("openai", "gpt-4o-mini").state == OPEN
@@ -0,0 +1,70 @@
+import dspy
+import pytest
+from app.services.ayla.context_delta import apply_delta, merge_delta
+
+CONTEXT = {"status": "quantity", "product": "laptops", "product_category": "Electronics", "quantity": None, "supplier_type": None}
+
+
+def delta(changes, status="supplier_type", to_ozil=False, ayla_response="Noted."):
+    return dspy.Prediction(ayla_response=ayla_response, to_ozil=to_ozil, status=status, changes=changes)
+
+
+def test_changes_are_merged_and_omitted_fields_kept():
+    merged, to_ozil = merge_delta(CONTEXT, delta({"quantity": "1,000 units", "brand": " Dell "}))
+    assert merged["quantity"] == 1000
+    assert merged["brand"] == "Dell"
+    assert merged["product"] == "laptops"
+    assert merged["status"] == "supplier_type"
+    assert to_ozil is False
+
+
+def test_output_field_names_map_to_context_keys():
+    merged, _ = merge_delta(CONTEXT, delta({"product_name": "gaming laptops"}))
+    assert merged["product"] == "gaming laptops"
+
+
+@pytest.mark.parametrize("changes", [
+    {"quantity": 0},
+    {"quantity": -5},
+    {"quantity": True},
+    {"quantity": "a few"},
+    {"quantity": 2.5},
+    {"supplier_type": "cheapest"},
+    {"product_name": "   "},
+])
+def test_invalid_values_are_rejected(changes):
+    merged, _ = merge_delta(CONTEXT, delta(changes))
+    assert {key: merged[key] for key in CONTEXT if key != "status"} == {
+        key: value for key, value in CONTEXT.items() if key != "status"
+    }
+
+
+def test_null_and_unknown_fields_never_wipe_or_add_state():
+    merged, _ = merge_delta({**CONTEXT, "quantity": 25}, delta({"quantity": None, "price": 900, "status": "complete"}))
+    assert merged["quantity"] == 25
+    assert "price" not in merged
+    assert merged["status"] == "supplier_type"
+
+
+def test_non_dict_changes_and_unknown_status_are_ignored():
+    merged, _ = merge_delta(CONTEXT, delta("quantity=25", status="thinking"))
+    assert merged == CONTEXT
+
+
+def test_completion_without_required_fields_is_rejected():
+    merged, to_ozil = merge_delta(CONTEXT, delta({"quantity": 25}, status="complete", to_ozil=True))
+    assert to_ozil is False
+    assert merged["status"] == "supplier_type"
+    assert merged["quantity"] == 25
+
+
+def test_completion_with_required_fields_goes_through():
+    prediction = apply_delta(
+        {**CONTEXT, "quantity": 25},
+        delta({"supplier_type": "Both"}, status="complete", to_ozil=True, ayla_response="Done.")
+    )
+    assert prediction.to_ozil is True
+    assert prediction.status == "complete"
+    assert prediction.supplier_type == "both"
+    assert prediction.product_name == "laptops"
+    assert prediction.ayla_response == "Done."
@@ -0,0 +1,96 @@
+import pytest
+from app.services.ayla.fast_path import FastPathExtractor
+
+QUANTITY_CONTEXT = {"status": "quantity", "product": "laptops", "quantity": None, "supplier_type": None}
+SUPPLIER_CONTEXT = {"status": "supplier_type", "product": "laptops", "quantity": 25, "supplier_type": None}
+OPTIONAL_CONTEXT = {"status": "supplier_type", "product": "laptops", "quantity": 25, "supplier_type": "private"}
+ASKED_OPTIONAL = [
+    {"role": "user", "content": "private"},
+    {"role": "assistant", "content": "Would you like to provide any optional details?"},
+]
+
+
+@pytest.fixture
+def extractor():
+    return FastPathExtractor()
+
+
+@pytest.mark.parametrize("message, quantity, items", [
+    ("25", 25, "25 laptops"),
+    ("1,000", 1000, "1000 laptops"),
+    ("about 30.", 30, "30 laptops"),
+    ("25 laptops", 25, "25 laptops"),
+    ("25 laptop", 25, "25 laptops"),
+    ("10 boxes of laptops", 10, "10 boxes of laptops"),
+    ("40 units", 40, "40 units of laptops"),
+])
+def test_bare_quantities(extractor, message, quantity, items):
+    prediction = extractor.reply(message, QUANTITY_CONTEXT, [])
+    assert prediction.quantity == quantity
+    assert prediction.status == "supplier_type"
+    assert items in prediction.ayla_response
+
+
+@pytest.mark.parametrize("message", [
+    "25 thousand",
+    "2 million",
+    "3 dozen",
+    "25k",
+    "5 hundred laptops",
+    "100 from dell",
+    "25 next week",
+    "25 of",
+    "0",
+    "25 or 30",
+    "I need 25",
+])
+def test_anything_but_a_plain_quantity_goes_to_the_model(extractor, message):
+    assert extractor.reply(message, QUANTITY_CONTEXT, []) is None
+
+
+@pytest.mark.parametrize("message, supplier_type", [
+    ("private", "private"),
+    ("Public suppliers only.", "public"),
+    ("private and public", "both"),
+    ("both please", "both"),
+])
+def test_supplier_types(extractor, message, supplier_type):
+    prediction = extractor.reply(message, SUPPLIER_CONTEXT, [])
+    assert prediction.supplier_type == supplier_type
+    assert "optional details" in prediction.ayla_response
+
+
+def test_unclear_supplier_type_goes_to_the_model(extractor):
+    assert extractor.reply("private, but not amazon", SUPPLIER_CONTEXT, []) is None
+
+
+@pytest.mark.parametrize("message", [
+    "no",
+    "Nope.",
+    "No, that's all I need",
+    "nothing else, thanks",
+    "no thank you",
+    "that's all",
+])
+def test_refusals_complete_the_request(extractor, message):
+    prediction = extractor.reply(message, OPTIONAL_CONTEXT, ASKED_OPTIONAL)
+    assert prediction.status == "complete"
+    assert prediction.to_ozil is True
+    assert "Quantity: 25" in prediction.ayla_response
+
+
+@pytest.mark.parametrize("message", [
+    "no i need it by friday",
+    "no i need it",
+    "no brand preference but deliver to Berlin",
+    "ok",
+    "thanks",
+    "yes",
+])
+def test_anything_but_a_refusal_goes_to_the_model(extractor, message):
+    assert extractor.reply(message, OPTIONAL_CONTEXT, ASKED_OPTIONAL) is None
+
+
+def test_refusal_needs_the_optional_question_and_required_fields(extractor):
+    assert extractor.reply("no", OPTIONAL_CONTEXT, []) is None
+    assert extractor.reply("no", {**OPTIONAL_CONTEXT, "supplier_type": None, "status": "product"}, ASKED_OPTIONAL) is None
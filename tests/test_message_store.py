@@ -0,0 +1,76 @@
+import asyncio
+import pytest
+from bson.objectid import ObjectId
+from app.core.message_store import MESSAGES_COLLECTION, MessageLogError, MessageStore
+from benchmarks.memory_mongo import MemoryDatabase
+
+
+def message(content):
+    return {"content": content, "sender": "user", "type": "text"}
+
+
+async def new_conversation(db, message_count=0):
+    result = await db.conversations.insert_one({"user_id": "u1", "status": "active", "message_count": message_count})
+    return str(result.inserted_id)
+
+
+def test_seq_continues_the_conversation_numbering():
+    async def run():
+        db = MemoryDatabase()
+        store = MessageStore(db, window=3)
+        conversation_id = await new_conversation(db, message_count=2)  # two migrated legacy messages
+        await store.append(conversation_id, [message("a"), message("b")])
+        await store.append(conversation_id, [message("c")], set_fields={"status": "completed"})
+        conversation = await db.conversations.find_one({"_id": ObjectId(conversation_id)})
+        return conversation, await store.get_messages(conversation_id)
+
+    conversation, log = asyncio.run(run())
+    assert [m["seq"] for m in log] == [3, 4, 5]
+    assert [m["content"] for m in log] == ["a", "b", "c"]
+    assert conversation["message_count"] == 5
+    assert conversation["status"] == "completed"
+    assert [m["content"] for m in conversation["recent_messages"]] == ["a", "b", "c"]
+
+
+def test_concurrent_appends_get_distinct_seqs():
+    async def run():
+        db = MemoryDatabase(latency=0.001)
+        store = MessageStore(db)
+        conversation_id = await new_conversation(db)
+        await asyncio.gather(*(store.append(conversation_id, [message(str(i)), message(str(i))]) for i in range(10)))
+        return await store.get_messages(conversation_id, limit=100)
+
+    log = asyncio.run(run())
+    assert [m["seq"] for m in log] == list(range(1, 21))
+
+
+def test_failed_log_insert_reports_that_the_conversation_was_updated():
+    async def run():
+        db = MemoryDatabase()
+        store = MessageStore(db)
+        conversation_id = await new_conversation(db)
+
+        async def fail(*args, **kwargs):
+            raise RuntimeError("insert failed")
+
+        db[MESSAGES_COLLECTION].insert_many = fail
+        with pytest.raises(MessageLogError):
+            await store.append(conversation_id, [message("a")])
+        return await db.conversations.find_one({"_id": ObjectId(conversation_id)})
+
+    conversation = asyncio.run(run())
+    assert conversation["message_count"] == 1
+    assert [m["content"] for m in conversation["recent_messages"]] == ["a"]
+
+
+def test_append_returns_the_conversation_owner():
+    async def run():
+        db = MemoryDatabase()
+        store = MessageStore(db)
+        conversation_id = await new_conversation(db)
+        return await store.append(conversation_id, [message("a")]), await store.append(str(ObjectId()), [message("b")])
+
+    conversation, missing = asyncio.run(run())
+    assert conversation["user_id"] == "u1"
+    assert conversation["message_count"] == 1
+    assert missing is None
@@ -0,0 +1,60 @@
+import asyncio
+from types import SimpleNamespace
+import litellm
+from app.services.ayla.ayla_model_manager import AylaModelManager
+
+COMPLETION = (
+    "[[ ## ayla_response ## ]]\nHow many laptops do you need?\n\n"
+    "[[ ## to_ozil ## ]]\nFalse\n\n"
+    "[[ ## status ## ]]\nquantity\n\n"
+    "[[ ## product_name ## ]]\nlaptops\n\n"
+    "[[ ## product_category ## ]]\nElectronics\n\n"
+    "[[ ## quantity ## ]]\nnull\n\n"
+    "[[ ## supplier_type ## ]]\nnull\n\n"
+    "[[ ## brand ## ]]\nnull\n\n"
+    "[[ ## model ## ]]\nnull\n\n"
+    "[[ ## description ## ]]\nnull\n\n"
+    "[[ ## delivery_location ## ]]\nnull\n\n"
+    "[[ ## preferred_delivery_timeline ## ]]\nnull\n\n"
+    "[[ ## supplier_list_name ## ]]\nnull\n\n"
+    "[[ ## completed ## ]]"
+)
+
+
+def chunk(content):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+async def fake_acompletion(**kwargs):
+    assert kwargs["stream_options"] == {"include_usage": True}
+
+    async def stream():
+        for i in range(0, len(COMPLETION), 7):
+            yield chunk(COMPLETION[i:i + 7])
+        # With include_usage the provider ends the stream with a chunk that has no choices
+        yield SimpleNamespace(choices=[], usage=SimpleNamespace(prompt_tokens=900, completion_tokens=60))
+
+    return stream()
+
+
+def test_usage_only_chunk_ends_the_stream_cleanly(monkeypatch):
+    monkeypatch.setattr(litellm, "acompletion", fake_acompletion)
+    manager = AylaModelManager()
+
+    async def no_fallback(*args, **kwargs):
+        raise AssertionError("the streamed completion should parse without a retry")
+
+    monkeypatch.setattr(manager, "get_model_response", no_fallback)
+    tokens = []
+
+    async def on_token(text):
+        tokens.append(text)
+
+    response = asyncio.run(manager.stream_model_response(
+        "I need laptops", [], on_token, provider="openai", model="gpt-4o-mini"
+    ))
+
+    assert "".join(tokens) == "How many laptops do you need?"
+    assert response.status == "quantity"
+    assert response.product_name == "laptops"
+    assert response.to_ozil is False
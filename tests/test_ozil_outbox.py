@@ -0,0 +1,74 @@
+import asyncio
+from types import SimpleNamespace
+from app.services.ayla import ozil_outbox
+from app.services.ayla.ozil_outbox import OUTBOX_COLLECTION, OzilOutbox
+from benchmarks.memory_mongo import MemoryDatabase
+
+
+def test_enqueue_is_idempotent_and_waits_for_start():
+    async def run():
+        db = MemoryDatabase()
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        outbox = OzilOutbox(db, send, workers=2, poll_interval=0.01)
+        await outbox.enqueue("c1", {"product": "laptops"})
+        await outbox.enqueue("c1", {"product": "printer paper"})
+        await asyncio.sleep(0.05)
+        before_start = list(sent)
+
+        outbox.start()
+        for _ in range(100):
+            if sent:
+                break
+            await asyncio.sleep(0.01)
+        await outbox.stop()
+        return before_start, sent, db[OUTBOX_COLLECTION].documents["c1"]
+
+    before_start, sent, entry = asyncio.run(run())
+    assert before_start == []
+    assert sent == [{"product": "laptops", "idempotency_key": "c1"}]
+    assert entry["status"] == "delivered"
+
+
+def test_lifespan_workers_wait_for_a_sender(monkeypatch):
+    monkeypatch.setattr(ozil_outbox, "_outbox", None)
+    settings = SimpleNamespace(OZIL_OUTBOX_WORKERS=1, OZIL_OUTBOX_BATCH_SIZE=10, OZIL_OUTBOX_MAX_ATTEMPTS=8)
+    db = MemoryDatabase()
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def run():
+        outbox = ozil_outbox.init_ozil_outbox(db, settings)
+        outbox.poll_interval = 0.01
+        await outbox.enqueue("c1", {"product": "laptops"})
+        await asyncio.sleep(0.05)
+        before_attach = list(sent)
+
+        assert ozil_outbox.get_ozil_outbox(db, settings, send) is outbox
+        for _ in range(100):
+            if sent:
+                break
+            await asyncio.sleep(0.01)
+        await ozil_outbox.stop_ozil_outbox()
+        return before_attach
+
+    before_attach = asyncio.run(run())
+    assert before_attach == []
+    assert sent == [{"product": "laptops", "idempotency_key": "c1"}]
+
+
+def test_get_outside_a_running_loop_starts_nothing(monkeypatch):
+    monkeypatch.setattr(ozil_outbox, "_outbox", None)
+    settings = SimpleNamespace(OZIL_OUTBOX_WORKERS=1, OZIL_OUTBOX_BATCH_SIZE=10, OZIL_OUTBOX_MAX_ATTEMPTS=8)
+
+    async def send(message):
+        pass
+
+    outbox = ozil_outbox.get_ozil_outbox(MemoryDatabase(), settings, send)
+    assert outbox.send is send
+    assert outbox._tasks == []
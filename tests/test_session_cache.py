@@ -0,0 +1,16 @@
+import asyncio
+from bson.objectid import ObjectId
+from app.core.session_cache import SessionCache
+
+
+def test_invalidate_user_drops_the_cached_conversation():
+    async def run():
+        cache = SessionCache()
+        await cache.put({"_id": ObjectId(), "user_id": "u1", "status": "active"})
+        cached = await cache.get("u1")
+        await cache.invalidate_user("u1")
+        return cached, await cache.get("u1")
+
+    cached, after = asyncio.run(run())
+    assert cached["user_id"] == "u1"
+    assert after is None
@@ -0,0 +1,47 @@
+from app.services.ayla.stream_parser import FieldStreamParser
+
+COMPLETION = (
+    "[[ ## reasoning ## ]]\nThe user wants laptops.\n\n"
+    "[[ ## ayla_response ## ]]\nHow many laptops do you need?\n\n"
+    "[[ ## to_ozil ## ]]\nfalse\n\n"
+    "[[ ## completed ## ]]"
+)
+
+
+def stream(parser: FieldStreamParser, text: str, size: int) -> str:
+    out = "".join(parser.feed(text[i:i + size]) for i in range(0, len(text), size))
+    return out + parser.flush()
+
+
+def test_extracts_only_the_watched_field():
+    assert stream(FieldStreamParser("ayla_response"), COMPLETION, len(COMPLETION)) == "How many laptops do you need?"
+
+
+def test_chunk_boundaries_do_not_change_the_output():
+    for size in range(1, 12):
+        assert stream(FieldStreamParser("ayla_response"), COMPLETION, size) == "How many laptops do you need?"
+
+
+def test_partial_next_header_is_held_back():
+    parser = FieldStreamParser("ayla_response")
+    assert parser.feed("[[ ## ayla_response ## ]]\nHello there\n\n[[ #") == "Hello there"
+    assert parser.feed("# to_ozil ## ]]\ntrue") == ""
+    assert parser.finished
+
+
+def test_inner_whitespace_is_kept_between_chunks():
+    parser = FieldStreamParser("ayla_response")
+    assert parser.feed("[[ ## ayla_response ## ]]\n\nHello ") == "Hello"
+    assert parser.feed("world") == " world"
+
+
+def test_flush_returns_the_rest_of_an_unterminated_field():
+    parser = FieldStreamParser("ayla_response")
+    assert parser.feed("[[ ## ayla_response ## ]]\nHi [[") == "Hi"
+    assert parser.flush() == " [["
+
+
+def test_missing_field_yields_nothing():
+    parser = FieldStreamParser("ayla_response")
+    assert parser.feed("[[ ## reasoning ## ]]\nthinking") == ""
+    assert parser.flush() == ""
@@ -0,0 +1,54 @@
+import json
+import pytest
+from app.services.ayla.ayla_model_manager import ChatResponse
+from app.services.ayla.structured_output import StructuredOutputError, response_format, structured_predict, with_reasoning
+
+INPUTS = {"messages": [], "context": "Current status: product", "message": "I need laptops"}
+
+
+class FakeLM:
+    """Returns one canned completion and records the request"""
+
+    def __init__(self, completion: str):
+        self.completion = completion
+        self.requests = []
+
+    def __call__(self, messages, **kwargs):
+        self.requests.append({"messages": messages, **kwargs})
+        return [self.completion]
+
+
+def test_schema_covers_the_chat_response_output_fields():
+    schema = response_format(ChatResponse)
+    assert schema["type"] == "json_schema"
+    assert schema["json_schema"]["name"] == "ChatResponseOutput"
+    properties = schema["json_schema"]["schema"]["properties"]
+    assert list(properties) == list(ChatResponse.output_fields)
+    assert properties["to_ozil"]["type"] == "boolean"
+    assert properties["ayla_response"]["description"] == "Ayla's response to the user"
+    assert {"type": "integer"} in properties["quantity"]["anyOf"]
+    json.dumps(schema)  # plain data, so it can be part of a cache key
+
+
+def test_reasoning_comes_first():
+    schema = response_format(with_reasoning(ChatResponse))
+    assert list(schema["json_schema"]["schema"]["properties"])[0] == "reasoning"
+
+
+def test_a_completion_is_parsed_with_the_schema_sent():
+    outputs = {name: None for name in ChatResponse.output_fields}
+    outputs.update(ayla_response="How many laptops?", to_ozil=False, status="quantity", product_name="laptops")
+    lm = FakeLM(json.dumps(outputs))
+    schema = response_format(ChatResponse)
+
+    prediction = structured_predict(lm, ChatResponse, INPUTS, schema)
+    assert prediction.ayla_response == "How many laptops?"
+    assert prediction.product_name == "laptops"
+    assert prediction.to_ozil is False
+    assert lm.requests[0]["response_format"] is schema
+
+
+@pytest.mark.parametrize("completion", ["Sure! How many laptops do you need?", '{"ayla_response": "How many?"}'])
+def test_an_unparseable_completion_raises(completion):
+    with pytest.raises(StructuredOutputError):
+        structured_predict(FakeLM(completion), ChatResponse, INPUTS, response_format(ChatResponse))
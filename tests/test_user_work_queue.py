@@ -0,0 +1,55 @@
+import asyncio
+from app.core.user_work_queue import UserWorkQueue
+
+
+def merge_text(waiting: str, new: str, max_chars: int = 12):
+    merged = f"{waiting}+{new}"
+    return merged if len(merged) <= max_chars else None
+
+
+async def run_queue(policy: str, messages, max_depth: int = 2, dropped=None):
+    handled = []
+    release = asyncio.Event()
+
+    async def handler(key, payload):
+        await release.wait()
+        handled.append(payload)
+
+    async def on_drop(key, payload):
+        dropped.append((key, payload))
+
+    queue = UserWorkQueue(
+        handler, max_depth=max_depth, policy=policy, merge=merge_text, on_drop=on_drop if dropped is not None else None
+    )
+    accepted = [queue.submit("u1", messages[0])]
+    await asyncio.sleep(0)  # the first job is now running, the rest wait behind it
+    accepted += [queue.submit("u1", message) for message in messages[1:]]
+    release.set()
+    while queue.depth("u1") or "u1" in queue._workers:
+        await asyncio.sleep(0)
+    return accepted, handled
+
+
+def test_jobs_run_in_order_while_under_the_depth_limit():
+    accepted, handled = asyncio.run(run_queue("merge", ["a", "b", "c"]))
+    assert accepted == [True, True, True]
+    assert handled == ["a", "b", "c"]
+
+
+def test_merge_only_folds_jobs_beyond_the_depth_limit():
+    accepted, handled = asyncio.run(run_queue("merge", ["a", "b", "c", "d", "e"]))
+    assert accepted == [True] * 5
+    assert handled == ["a", "b", "c+d+e"]
+
+
+def test_merge_refuses_jobs_once_the_merged_payload_is_too_long():
+    accepted, handled = asyncio.run(run_queue("merge", ["a", "b", "cccc", "dddd", "eeee"]))
+    assert accepted == [True, True, True, True, False]
+    assert handled == ["a", "b", "cccc+dddd"]
+
+
+def test_reject_and_drop_oldest():
+    assert asyncio.run(run_queue("reject", ["a", "b", "c", "d"])) == ([True, True, True, False], ["a", "b", "c"])
+    dropped = []
+    assert asyncio.run(run_queue("drop_oldest", ["a", "b", "c", "d"], dropped=dropped)) == ([True] * 4, ["a", "c", "d"])
+    assert dropped == [("u1", "b")]